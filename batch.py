@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+
+import contextlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+
+from link_resolver import ShortLinkResolver, parse_video_url
+from pipeline import Pipeline, Stage
+from rate_limit import HostRateLimiter
+from tiktok_downloader import TikTokDownloader, BASE_URL, DEFAULT_SCRAPE_BURST, DEFAULT_SCRAPE_RATE, parse_hd_download_link
+
+URL_RE = re.compile(r'https?://\S+')
+
+
+def read_urls(path):
+    urls = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            match = URL_RE.search(line)
+            if match:
+                urls.append(match.group(0))
+    return urls
+
+
+class Manifest:
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.completed = {}
+        
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    if record.get('video_id') and record.get('file') and os.path.exists(record['file']):
+                        self.completed[record['video_id']] = record
+
+    def is_completed(self, video_id):
+        return video_id in self.completed
+
+    def add(self, record):
+        with self.lock:
+            self.completed[record['video_id']] = record
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+
+
+class BatchDownloader:
+    def __init__(self, out_dir, jobs=4, manifest_path=None, results=None, segments=1, base_url=BASE_URL,
+                 scrape_jobs=None, parse_jobs=2, rate=DEFAULT_SCRAPE_RATE, burst=DEFAULT_SCRAPE_BURST,
+                 queue_size=100, stats_interval=10.0):
+        self.out_dir = out_dir
+        self.base_url = base_url
+        self.jobs = jobs
+        self.scrape_jobs = scrape_jobs or jobs
+        self.parse_jobs = parse_jobs
+        self.queue_size = queue_size
+        self.stats_interval = stats_interval
+        self.segments = segments
+        self.downloader = TikTokDownloader(
+            base_url=base_url, segments=segments, rate_limiter=HostRateLimiter(rate, burst),
+            scraper_pool_size=self.scrape_jobs, cdn_pool_size=jobs * max(1, segments), pool_block=True
+        )
+        self.results = results or sys.stdout
+        self.seen_lock = threading.Lock()
+        self.seen = set()
+        self.counts = {}
+        self.pipeline = None
+        
+        if not os.path.exists(out_dir):
+            os.makedirs(out_dir)
+        
+        self.manifest = Manifest(manifest_path or os.path.join(out_dir, 'manifest.jsonl'))
+        self.resolver = ShortLinkResolver(os.path.join(out_dir, '.cache', 'short_links.db'))
+
+    def claim(self, video_id):
+        with self.seen_lock:
+            if video_id in self.seen:
+                return False
+            self.seen.add(video_id)
+            return True
+
+    def resolve(self, item):
+        resolved = self.resolver.resolve(item.url)
+        parsed = parse_video_url(resolved)
+        if not parsed:
+            item.error = 'Unsupported URL, expected a TikTok video link'
+            return
+        
+        creator, video_id = parsed
+        item.data.update(resolved=resolved, video_id=video_id)
+        
+        if not self.claim(video_id):
+            item.data['status'] = 'duplicate'
+            item.done = True
+        elif self.manifest.is_completed(video_id):
+            item.data.update(status='skipped', file=self.manifest.completed[video_id]['file'])
+            item.done = True
+        else:
+            filename = f"{creator}_{video_id}.mp4" if creator else f"tiktok_{video_id}.mp4"
+            item.data['file'] = os.path.join(self.out_dir, filename)
+
+    def scrape(self, item):
+        response_data = self.downloader.get_download_page(item.data['resolved'])
+        if not response_data:
+            item.error = 'ajaxSearch request failed'
+            return
+        item.data['response'] = response_data
+
+    def parse(self, item):
+        download_url = parse_hd_download_link(item.data.pop('response'))
+        if not download_url:
+            item.error = 'No download link found'
+            return
+        item.data['download_url'] = download_url
+
+    def fetch(self, item):
+        if not self.downloader.download_video(item.data['download_url'], item.data['file']):
+            item.error = 'Download failed'
+            return
+        item.data.update(status='ok', bytes=os.path.getsize(item.data['file']))
+
+    def deliver(self, item):
+        data = item.data
+        record = {
+            'url': item.url,
+            'video_id': data.get('video_id'),
+            'status': 'failed' if item.error else data.get('status', 'failed'),
+            'file': data.get('file') if not item.error else None,
+            'bytes': data.get('bytes', 0),
+            'seconds': round(time.monotonic() - item.created_at, 3)
+        }
+        if item.error:
+            record['error'] = item.error
+        
+        if record['status'] == 'ok':
+            self.manifest.add(record)
+        
+        self.results.write(json.dumps(record) + '\n')
+        self.results.flush()
+        self.counts[record['status']] = self.counts.get(record['status'], 0) + 1
+        item.done = True
+
+    def run(self, urls):
+        self.pipeline = Pipeline([
+            Stage('resolve', self.resolve, self.scrape_jobs, self.queue_size),
+            Stage('scrape', self.scrape, self.scrape_jobs, self.queue_size),
+            Stage('parse', self.parse, self.parse_jobs, self.queue_size),
+            Stage('fetch', self.fetch, self.jobs, self.queue_size),
+            Stage('deliver', self.deliver, 1, self.queue_size),
+        ])
+        self.pipeline.run(urls, report=self.report, report_interval=self.stats_interval)
+        return self.counts
+
+    def report(self, stages):
+        delivered = stages['deliver']
+        print(f"[*] Pipeline progress: {delivered['processed'] + delivered['failed']} URLs done", file=sys.stderr)
+        print_stage_stats(stages)
+
+
+def print_stage_stats(stages):
+    for name, stats in stages.items():
+        print(
+            f"    {name:8s} workers={stats['workers']:<3d} queued={stats['queue_depth']:<5d} "
+            f"processed={stats['processed']:<6d} failed={stats['failed']:<5d} {stats['throughput']:7.2f}/s  "
+            f"utilization={stats['utilization']:.0%}",
+            file=sys.stderr
+        )
+
+
+def run_batch(input_path, out_dir, jobs=4, manifest_path=None, results_path=None, segments=1,
+              scrape_jobs=None, parse_jobs=2, rate=DEFAULT_SCRAPE_RATE, stats_interval=10.0):
+    urls = read_urls(input_path)
+    
+    results = sys.stdout if results_path in (None, '-') else open(results_path, 'a', encoding='utf-8')
+    try:
+        # Keep stdout clean for JSONL results; progress output goes to stderr.
+        redirect = contextlib.redirect_stdout(sys.stderr) if results is sys.stdout else contextlib.nullcontext()
+        with redirect:
+            batch = BatchDownloader(
+                out_dir, jobs, manifest_path, results, segments,
+                scrape_jobs=scrape_jobs, parse_jobs=parse_jobs, rate=rate, stats_interval=stats_interval
+            )
+            counts = batch.run(urls)
+            batch.resolver.close()
+            batch.downloader.close()
+    finally:
+        if results is not sys.stdout:
+            results.close()
+    
+    summary = ', '.join(f"{count} {status}" for status, count in sorted(counts.items()))
+    print(f"[+] Processed {len(urls)} URLs: {summary or 'nothing to do'}", file=sys.stderr)
+    print_stage_stats(batch.pipeline.stats())
+    return counts
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rate_limit import HostRateLimiter
+from tiktok_downloader import AsyncTikTokDownloader
+from stub_server import StubServer
+
+
+async def run_batch(downloader, count, out_dir):
+    tasks = [
+        downloader.download_tiktok_hd(
+            f"https://www.tiktok.com/@user/video/{i}",
+            os.path.join(out_dir, f"video_{i}.mp4")
+        )
+        for i in range(count)
+    ]
+    start = time.perf_counter()
+    results = await asyncio.gather(*tasks)
+    return time.perf_counter() - start, sum(results)
+
+
+async def main(args):
+    with StubServer(latency=args.latency, video_size=args.size) as server:
+        downloader = AsyncTikTokDownloader(
+            base_url=server.url, rate_limiter=HostRateLimiter(args.rate, args.burst)
+        )
+        with tempfile.TemporaryDirectory() as out_dir, contextlib.redirect_stdout(io.StringIO()):
+            single, _ = await run_batch(downloader, 1, out_dir)
+            batch, ok = await run_batch(downloader, args.requests, out_dir)
+        await downloader.aclose()
+    
+    print(f"1 request:              {single:.3f}s")
+    print(f"{args.requests} concurrent requests: {batch:.3f}s ({ok}/{args.requests} ok)")
+    print(f"slowdown vs single:     {batch / single:.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent AsyncTikTokDownloader benchmark against a local stub server")
+    parser.add_argument('--requests', type=int, default=50)
+    parser.add_argument('--latency', type=float, default=0.2, help="stub server latency per request in seconds")
+    parser.add_argument('--rate', type=float, default=0, help="ajaxSearch requests per second per host (0 = unlimited)")
+    parser.add_argument('--burst', type=int, default=None, help="rate limiter burst size")
+    parser.add_argument('--size', type=int, default=1024 * 1024, help="stub video size in bytes")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tiktok_downloader import collect_links_lxml, collect_links_soup
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'ajaxsearch')
+
+
+def load_corpus(directory):
+    corpus = []
+    for path in sorted(glob.glob(os.path.join(directory, '*'))):
+        with open(path, encoding='utf-8') as f:
+            if path.endswith('.json'):
+                data = json.load(f)
+                if data.get('data'):
+                    corpus.append((os.path.basename(path), data['data'], True))
+            else:
+                corpus.append((os.path.basename(path), f.read(), False))
+    return corpus
+
+
+def ops_per_second(func, corpus, min_time):
+    runs = 0
+    start = time.perf_counter()
+    while True:
+        for _, html, json_mode in corpus:
+            func(html, json_mode)
+        runs += len(corpus)
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            return runs / elapsed
+
+
+def main(args):
+    corpus = load_corpus(args.fixtures)
+    if not corpus:
+        print(f"No fixtures found in {args.fixtures}")
+        return 1
+    
+    for name, html, json_mode in corpus:
+        expected = collect_links_soup(html, json_mode)
+        actual = collect_links_lxml(html, json_mode)
+        if actual != expected:
+            print(f"[!] Candidate mismatch for {name}")
+            print(f"    html.parser: {expected}")
+            print(f"    lxml:        {actual}")
+            return 1
+        print(f"[*] {name}: {len(actual)} candidates, identical")
+    
+    soup_rate = ops_per_second(collect_links_soup, corpus, args.min_time)
+    lxml_rate = ops_per_second(collect_links_lxml, corpus, args.min_time)
+    
+    print(f"\nBeautifulSoup html.parser: {soup_rate:10.1f} docs/s")
+    print(f"lxml single pass:          {lxml_rate:10.1f} docs/s")
+    print(f"speedup:                   {lxml_rate / soup_rate:10.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare link extraction speed over saved ajaxSearch responses")
+    parser.add_argument('--fixtures', default=FIXTURES)
+    parser.add_argument('--min-time', type=float, default=2.0, help="seconds to run each parser")
+    sys.exit(main(parser.parse_args()))
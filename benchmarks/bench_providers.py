@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from providers import AjaxSearchProvider, ProviderSelector
+from rate_limit import HostRateLimiter
+from stub_server import StubServer
+
+
+async def main(args):
+    with StubServer(latency=args.slow, video_size=1024) as slow, \
+            StubServer(latency=0.01, video_size=1024, error_rate=1.0) as failing, \
+            StubServer(latency=args.fast, video_size=1024) as fast:
+        no_limit = HostRateLimiter(0)
+        providers = [
+            AjaxSearchProvider(failing.url, name='failing', rate_limiter=no_limit),
+            AjaxSearchProvider(slow.url, name='slow', rate_limiter=no_limit),
+            AjaxSearchProvider(fast.url, name='fast', rate_limiter=no_limit),
+        ]
+        selector = ProviderSelector(providers, hedge_delay=args.hedge_delay, failure_threshold=3)
+        
+        latencies = []
+        for i in range(args.requests):
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                await selector.resolve(f"https://www.tiktok.com/@user/video/{i}")
+            latencies.append(time.perf_counter() - start)
+            print(f"request {i + 1:2d}: {latencies[-1]:.3f}s  ranking: {[h.provider.name for h in selector.ranked()]}")
+        
+        print()
+        for name, stats in selector.stats().items():
+            latency = f"{stats['latency_ewma']:.3f}s" if stats['latency_ewma'] is not None else "-"
+            print(f"{name:8s} state={stats['state']:9s} latency={latency:8s} "
+                  f"error_rate={stats['error_rate_ewma']:.2f} requests={stats['requests']}")
+        await selector.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Provider selection, hedging and circuit breaking against local stub providers")
+    parser.add_argument('--requests', type=int, default=10)
+    parser.add_argument('--slow', type=float, default=1.0, help="latency of the slow stub in seconds")
+    parser.add_argument('--fast', type=float, default=0.05, help="latency of the fast stub in seconds")
+    parser.add_argument('--hedge-delay', type=float, default=0.3)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tiktok_downloader import TikTokDownloader
+from stub_server import StubServer
+
+
+def main(args):
+    counts = [int(count) for count in args.segments.split(',')]
+    
+    with StubServer(latency=args.latency, video_size=args.size, bandwidth=args.bandwidth) as server, \
+            tempfile.TemporaryDirectory() as out_dir:
+        video_url = f"{server.url}/video.mp4"
+        print(f"{args.size / 1024 / 1024:.1f} MB file, {args.bandwidth / 1024 / 1024:.1f} MB/s per connection\n")
+        
+        for count in counts:
+            downloader = TikTokDownloader(segments=count)
+            output_filename = os.path.join(out_dir, f"video_{count}.mp4")
+            
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                success = downloader.download_video(video_url, output_filename)
+            elapsed = time.perf_counter() - start
+            
+            with open(output_filename, 'rb') as f:
+                intact = success and f.read() == server.httpd.video_bytes
+            
+            throughput = args.size / elapsed / 1024 / 1024
+            print(f"segments={count:2d}  {elapsed:6.2f}s  {throughput:7.2f} MB/s  {'ok' if intact else 'CORRUPT'}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare segmented download throughput against a local range-capable server")
+    parser.add_argument('--segments', default='1,2,4,8', help="comma-separated segment counts")
+    parser.add_argument('--size', type=int, default=16 * 1024 * 1024, help="file size in bytes")
+    parser.add_argument('--bandwidth', type=float, default=4 * 1024 * 1024, help="per-connection bandwidth in bytes/s")
+    parser.add_argument('--latency', type=float, default=0.05)
+    main(parser.parse_args())
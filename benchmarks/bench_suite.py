@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+
+import argparse
+import asyncio
+import contextlib
+import datetime
+import io
+import json
+import logging
+import math
+import os
+import platform
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_parse import FIXTURES, load_corpus, ops_per_second
+from fake_telegram import FakeTelegramServer
+from stub_server import StubServer
+from rate_limit import HostRateLimiter
+from tiktok_downloader import AsyncTikTokDownloader, collect_download_links, parse_download_variants
+
+# Metrics compared against a baseline, and whether a larger value is an improvement.
+TRACKED_METRICS = {
+    'parse.docs_per_sec': True,
+    'parse.variants_per_sec': True,
+    'download.throughput_mb_s': True,
+    'download.p50_s': False,
+    'download.p99_s': False,
+    'e2e.requests_per_sec': True,
+    'e2e.p50_s': False,
+    'e2e.p99_s': False,
+}
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def latency_summary(latencies):
+    return {
+        'p50_s': percentile(latencies, 50),
+        'p90_s': percentile(latencies, 90),
+        'p99_s': percentile(latencies, 99),
+        'max_s': max(latencies) if latencies else None,
+    }
+
+
+def bench_parse(args):
+    corpus = load_corpus(args.fixtures)
+
+    def full_parse(html, json_mode):
+        return parse_download_variants({'status': 'ok', 'data': html} if json_mode else html)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        docs = ops_per_second(collect_download_links, corpus, args.min_time)
+        variants = ops_per_second(full_parse, corpus, args.min_time)
+    return {'fixtures': len(corpus), 'docs_per_sec': docs, 'variants_per_sec': variants}
+
+
+async def bench_download(args, server):
+    downloader = AsyncTikTokDownloader(
+        base_url=server.url, rate_limiter=HostRateLimiter(0), max_connections=args.concurrency,
+        max_keepalive_connections=args.concurrency
+    )
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies = []
+    failed = 0
+
+    async def download(i, out_dir):
+        nonlocal failed
+        async with semaphore:
+            start = time.perf_counter()
+            if await downloader.download_video(f"{server.url}/video.mp4", os.path.join(out_dir, f"{i}.mp4")):
+                latencies.append(time.perf_counter() - start)
+            else:
+                failed += 1
+
+    with tempfile.TemporaryDirectory() as out_dir, contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        await asyncio.gather(*(download(i, out_dir) for i in range(args.downloads)))
+        elapsed = time.perf_counter() - start
+    await downloader.aclose()
+
+    total = len(latencies) * len(server.httpd.video_bytes)
+    return {
+        'downloads': args.downloads,
+        'concurrency': args.concurrency,
+        'failed': failed,
+        'throughput_mb_s': total / elapsed / 1024 / 1024,
+        **latency_summary(latencies),
+    }
+
+
+def make_update(bot, i, users):
+    from telegram import Update
+
+    return Update.de_json({
+        'update_id': i,
+        'message': {
+            'message_id': i,
+            'date': int(time.time()),
+            'chat': {'id': 1000 + i, 'type': 'private'},
+            'from': {'id': 1000 + i % users, 'is_bot': False, 'first_name': 'Bench'},
+            'text': f"https://www.tiktok.com/@bench/video/{7000000000000000000 + i}",
+        }
+    }, bot)
+
+
+async def bench_e2e(args, server, telegram, work_dir):
+    work_dir = os.path.abspath(work_dir)
+    # Pinned so settings from the caller's environment or .env cannot switch the bot to local mode.
+    os.environ.update({
+        'LOCAL': 'false',
+        'STREAM_UPLOAD': 'true',
+        'TELEGRAM_API_URL': telegram.api_url,
+        'PROVIDER_URLS': server.url,
+        'SCRAPE_RATE_PER_SECOND': '0',
+        'MAX_CONCURRENT_DOWNLOADS': str(args.concurrency),
+        'MAX_DOWNLOADS_PER_USER': str(args.concurrency),
+        'MAX_QUEUE_SIZE': str(args.requests),
+        'USER_RATE_PER_MINUTE': '1000000',
+        'USER_BURST': str(args.requests),
+        'FILE_ID_CACHE_PATH': os.path.join(work_dir, 'file_ids.db'),
+        'SHORT_LINK_CACHE_PATH': os.path.join(work_dir, 'short_links.db'),
+        'MEDIA_STORE_PATH': os.path.join(work_dir, 'downloads', '.store'),
+    })
+    from telegram_bot import TikTokBot
+    logging.getLogger().setLevel(logging.WARNING)
+
+    # The bot creates its download directory relative to the working directory on construction.
+    cwd = os.getcwd()
+    os.chdir(work_dir)
+    try:
+        bot = TikTokBot('123456:BENCHMARK')
+    finally:
+        os.chdir(cwd)
+    bot.download_dir = os.path.join(work_dir, 'downloads')
+    application = bot.build_application()
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies = []
+
+    async def handle(i):
+        async with semaphore:
+            update = make_update(application.bot, i, args.users)
+            start = time.perf_counter()
+            await application.process_update(update)
+            latencies.append(time.perf_counter() - start)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        async with application:
+            start = time.perf_counter()
+            await asyncio.gather(*(handle(i) for i in range(args.requests)))
+            elapsed = time.perf_counter() - start
+        await bot.shutdown(application)
+
+    return {
+        'requests': args.requests,
+        'concurrency': args.concurrency,
+        'videos_sent': telegram.calls['sendVideo'],
+        'requests_per_sec': args.requests / elapsed,
+        **latency_summary(latencies),
+    }
+
+
+def flatten(results):
+    return {
+        f"{section}.{key}": value
+        for section, metrics in results.items()
+        for key, value in metrics.items()
+    }
+
+
+def compare(results, baseline_path, tolerance):
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = flatten(json.load(f)['results'])
+    current = flatten(results)
+
+    regressions = 0
+    print(f"\nComparison with {baseline_path} (tolerance {tolerance:.0%}):")
+    for name, higher_is_better in TRACKED_METRICS.items():
+        old, new = baseline.get(name), current.get(name)
+        if not old or new is None:
+            continue
+        change = (new - old) / old
+        regressed = change < -tolerance if higher_is_better else change > tolerance
+        regressions += regressed
+        print(f"    {name:28s} {old:12.4f} -> {new:12.4f}  {change:+7.1%}{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def report(results):
+    for section, metrics in results.items():
+        print(f"{section}:")
+        for key, value in metrics.items():
+            print(f"    {key:20s} {value:.4f}" if isinstance(value, float) else f"    {key:20s} {value}")
+
+
+async def run(args):
+    sections = set(args.only.split(','))
+    results = {}
+
+    if 'parse' in sections:
+        results['parse'] = bench_parse(args)
+
+    stub = StubServer(
+        latency=args.latency, cdn_latency=args.cdn_latency, video_size=args.size, bandwidth=args.bandwidth,
+        error_rate=args.error_rate, cdn_error_rate=args.cdn_error_rate, truncate_rate=args.truncate_rate,
+        fixture=args.fixture
+    )
+    telegram = FakeTelegramServer(latency=args.telegram_latency, upload_bandwidth=args.upload_bandwidth)
+    with stub as server, telegram, tempfile.TemporaryDirectory() as work_dir:
+        if 'download' in sections:
+            results['download'] = await bench_download(args, server)
+        if 'e2e' in sections:
+            results['e2e'] = await bench_e2e(args, server, telegram, work_dir)
+    return results
+
+
+def main(args):
+    results = asyncio.run(run(args))
+    report(results)
+
+    if args.output:
+        record = {
+            'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'config': vars(args),
+            'results': results,
+        }
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(record, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.compare and compare(results, args.compare, args.tolerance):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline parse, download and end-to-end bot benchmarks against local stubs")
+    parser.add_argument('--only', default='parse,download,e2e', help="comma-separated sections to run")
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=200, help="bot updates in the end-to-end run")
+    parser.add_argument('--users', type=int, default=50, help="distinct Telegram users sending those updates")
+    parser.add_argument('--downloads', type=int, default=50, help="videos fetched in the download run")
+    parser.add_argument('--size', type=int, default=1024 * 1024, help="HD video size in bytes")
+    parser.add_argument('--latency', type=float, default=0.05, help="ajaxSearch latency in seconds")
+    parser.add_argument('--cdn-latency', type=float, default=0.02, help="CDN time to first byte in seconds")
+    parser.add_argument('--bandwidth', type=int, help="CDN bytes per second per connection")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fraction of ajaxSearch requests failing with 503")
+    parser.add_argument('--cdn-error-rate', type=float, default=0.0, help="fraction of CDN requests failing with 503")
+    parser.add_argument('--truncate-rate', type=float, default=0.0, help="fraction of CDN responses cut off halfway")
+    parser.add_argument('--telegram-latency', type=float, default=0.05, help="fake Bot API latency in seconds")
+    parser.add_argument('--upload-bandwidth', type=int, help="fake Bot API upload bytes per second")
+    parser.add_argument('--fixture', help="recorded ajaxSearch response for the stub to serve")
+    parser.add_argument('--fixtures', default=FIXTURES, help="directory of recorded responses for the parse run")
+    parser.add_argument('--min-time', type=float, default=2.0, help="seconds to run each parse benchmark")
+    parser.add_argument('--output', help="write results to this JSON file")
+    parser.add_argument('--compare', help="baseline JSON file from a previous --output run")
+    parser.add_argument('--tolerance', type=float, default=0.1, help="relative change counted as a regression")
+    sys.exit(main(parser.parse_args()))
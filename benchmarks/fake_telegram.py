@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+
+import itertools
+import json
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler
+
+from stub_server import StubHTTPServer
+
+BOT_USER = {'id': 1, 'is_bot': True, 'first_name': 'Benchmark', 'username': 'benchmark_bot'}
+MESSAGE_METHODS = ('sendMessage', 'editMessageText', 'sendVideo', 'sendDocument')
+
+
+class FakeTelegramHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        self.rfile.read(length)
+        method = self.path.rstrip('/').rsplit('/', 1)[-1]
+
+        server = self.server
+        time.sleep(server.latency)
+        if method in ('sendVideo', 'sendDocument') and server.upload_bandwidth:
+            time.sleep(length / server.upload_bandwidth)
+
+        with server.lock:
+            server.calls[method] += 1
+            server.bytes_received += length
+            message_id = next(server.message_ids)
+
+        if method == 'getMe':
+            result = BOT_USER
+        elif method in MESSAGE_METHODS:
+            result = {
+                'message_id': message_id,
+                'date': int(time.time()),
+                'chat': {'id': 1, 'type': 'private'},
+                'from': BOT_USER,
+                'text': ''
+            }
+            if method == 'sendVideo':
+                result['video'] = {
+                    'file_id': f'video-{message_id}',
+                    'file_unique_id': f'unique-{message_id}',
+                    'width': 720,
+                    'height': 1280,
+                    'duration': 15,
+                    'file_size': length
+                }
+        else:
+            result = True
+
+        data = json.dumps({'ok': True, 'result': result}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class FakeTelegramServer:
+    def __init__(self, host='127.0.0.1', port=0, latency=0.05, upload_bandwidth=None):
+        self.httpd = StubHTTPServer((host, port), FakeTelegramHandler)
+        self.httpd.latency = latency
+        self.httpd.upload_bandwidth = upload_bandwidth
+        self.httpd.lock = threading.Lock()
+        self.httpd.calls = Counter()
+        self.httpd.bytes_received = 0
+        self.httpd.message_ids = itertools.count(1)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def api_url(self):
+        # Bot API base URL in the form python-telegram-bot expects; the token is appended to it.
+        return f"{self.url}/bot"
+
+    @property
+    def calls(self):
+        return self.httpd.calls
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8081
+    with FakeTelegramServer(port=port) as server:
+        print(f"Fake Telegram Bot API listening on {server.api_url}")
+        try:
+            server.thread.join()
+        except KeyboardInterrupt:
+            pass
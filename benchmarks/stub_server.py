@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# Each path serves a prefix of video_bytes, so variants have different sizes.
+MEDIA_FRACTIONS = {
+    '/video.mp4': 1.0,
+    '/video_sd.mp4': 0.5,
+    '/audio.mp3': 0.1,
+}
+URL_RE = re.compile(r'https?://[^"\'\s<>\\]+')
+
+
+def load_fixture(path):
+    with open(path, encoding='utf-8') as f:
+        return f.read(), path.endswith('.json')
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        self.rfile.read(length)
+        
+        if self.path != '/api/ajaxSearch':
+            self.send_error(404)
+            return
+        
+        time.sleep(self.server.latency)
+        
+        if random.random() < self.server.error_rate:
+            self.send_body(503, b'Service Unavailable', 'text/plain')
+            return
+        
+        host = f"http://{self.server.server_address[0]}:{self.server.server_address[1]}"
+        if self.server.fixture:
+            # Point every link in the recorded response at this server.
+            body, is_json = self.server.fixture
+            body = URL_RE.sub(f'{host}/video.mp4', body)
+            self.send_body(200, body.encode(), 'application/json' if is_json else 'text/html')
+            return
+        
+        html = (
+            '<div class="tik-video">'
+            f'<a href="{host}/video_sd.mp4" class="tik-button-dl">Download MP4 [1]</a>'
+            f'<a href="{host}/video.mp4" class="tik-button-dl">Download MP4 HD</a>'
+            f'<a href="{host}/audio.mp3" class="tik-button-dl">Download MP3</a>'
+            '</div>'
+        )
+        self.send_body(200, json.dumps({'status': 'ok', 'data': html}).encode(), 'application/json')
+
+    def media(self):
+        fraction = MEDIA_FRACTIONS.get(self.path.split('?')[0])
+        if fraction is None:
+            self.send_error(404)
+            return None
+        
+        time.sleep(self.server.cdn_latency)
+        
+        if random.random() < self.server.cdn_error_rate:
+            self.send_body(503, b'Service Unavailable', 'text/plain')
+            return None
+        
+        video = self.server.video_bytes
+        return video if fraction == 1.0 else video[:int(len(video) * fraction)]
+
+    def do_HEAD(self):
+        video = self.media()
+        if video is None:
+            return
+        
+        self.send_response(200)
+        self.send_header('Content-Type', 'video/mp4')
+        self.send_header('Content-Length', str(len(video)))
+        self.send_header('Accept-Ranges', 'bytes')
+        self.end_headers()
+
+    def do_GET(self):
+        video = self.media()
+        if video is None:
+            return
+        
+        match = re.match(r'bytes=(\d+)-(\d*)$', self.headers.get('Range', ''))
+        if not match:
+            self.send_body(200, video, 'video/mp4', truncate=random.random() < self.server.truncate_rate)
+            return
+        
+        start = int(match.group(1))
+        end = min(int(match.group(2)) if match.group(2) else len(video) - 1, len(video) - 1)
+        if start >= len(video):
+            self.send_response(416)
+            self.send_header('Content-Range', f'bytes */{len(video)}')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        
+        self.send_body(
+            206, video[start:end + 1], 'video/mp4',
+            {'Content-Range': f'bytes {start}-{end}/{len(video)}'},
+            truncate=random.random() < self.server.truncate_rate
+        )
+
+    def send_body(self, status, body, content_type, headers=None, truncate=False):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        if content_type == 'video/mp4':
+            self.send_header('Accept-Ranges', 'bytes')
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        
+        if truncate:
+            body = body[:len(body) // 2]
+            self.close_connection = True
+        
+        bandwidth = self.server.bandwidth
+        if not bandwidth:
+            self.wfile.write(body)
+            return
+        
+        piece = 64 * 1024
+        for offset in range(0, len(body), piece):
+            self.wfile.write(body[offset:offset + piece])
+            time.sleep(min(piece, len(body) - offset) / bandwidth)
+
+
+class StubHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+    def handle_error(self, request, client_address):
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class StubServer:
+    def __init__(self, host='127.0.0.1', port=0, latency=0.2, video_size=1024 * 1024, error_rate=0.0,
+                 truncate_rate=0.0, bandwidth=None, cdn_latency=None, cdn_error_rate=0.0, fixture=None):
+        self.httpd = StubHTTPServer((host, port), StubHandler)
+        self.httpd.bandwidth = bandwidth
+        self.httpd.latency = latency
+        self.httpd.cdn_latency = latency if cdn_latency is None else cdn_latency
+        self.httpd.error_rate = error_rate
+        self.httpd.cdn_error_rate = cdn_error_rate
+        self.httpd.fixture = load_fixture(fixture) if fixture else None
+        self.httpd.truncate_rate = truncate_rate
+        self.httpd.video_bytes = os.urandom(video_size)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Local stand-in for the ajaxSearch backend and its CDN")
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--latency', type=float, default=0.2, help="seconds before each ajaxSearch response")
+    parser.add_argument('--cdn-latency', type=float, help="seconds before each CDN response (default: --latency)")
+    parser.add_argument('--bandwidth', type=int, help="bytes per second per CDN connection")
+    parser.add_argument('--size', type=int, default=1024 * 1024, help="HD video size in bytes")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fraction of ajaxSearch requests answered with 503")
+    parser.add_argument('--cdn-error-rate', type=float, default=0.0, help="fraction of CDN requests answered with 503")
+    parser.add_argument('--truncate-rate', type=float, default=0.0, help="fraction of CDN responses cut off halfway")
+    parser.add_argument('--fixture', help="recorded ajaxSearch response to serve instead of the built-in one")
+    args = parser.parse_args()
+    
+    server = StubServer(
+        port=args.port, latency=args.latency, video_size=args.size, error_rate=args.error_rate,
+        truncate_rate=args.truncate_rate, bandwidth=args.bandwidth, cdn_latency=args.cdn_latency,
+        cdn_error_rate=args.cdn_error_rate, fixture=args.fixture
+    )
+    with server:
+        print(f"Stub server listening on {server.url}")
+        try:
+            server.thread.join()
+        except KeyboardInterrupt:
+            pass
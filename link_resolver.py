@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+
+import asyncio
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from urllib.parse import urljoin
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+VIDEO_URL_RE = re.compile(r'tiktok\.com/@([^/?#]+)/video/(\d+)')
+MOBILE_VIDEO_URL_RE = re.compile(r'tiktok\.com/v/(\d+)')
+SHORT_URL_RE = re.compile(r'https?://(?:vm|vt)\.tiktok\.com/([A-Za-z0-9]+)')
+
+MAX_REDIRECTS = 5
+
+
+def parse_video_url(url):
+    match = VIDEO_URL_RE.search(url)
+    if match:
+        return match.group(1), match.group(2)
+    
+    match = MOBILE_VIDEO_URL_RE.search(url)
+    if match:
+        return None, match.group(1)
+    
+    return None
+
+
+def canonical_video_url(creator, video_id):
+    if creator:
+        return f"https://www.tiktok.com/@{creator}/video/{video_id}"
+    return f"https://m.tiktok.com/v/{video_id}.html"
+
+
+def short_code(url):
+    match = SHORT_URL_RE.search(url)
+    return match.group(1) if match else None
+
+
+class ShortLinkResolver:
+    def __init__(self, path="cache/short_links.db", ttl=30 * 24 * 3600, timeout=10):
+        self.path = path
+        self.ttl = ttl
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        # Sessions are not thread-safe, so each thread gets one that mounts the shared pool.
+        self.adapter = HTTPAdapter()
+        self.local = threading.local()
+        
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS short_links ('
+            'code TEXT PRIMARY KEY, '
+            'creator TEXT, '
+            'video_id TEXT NOT NULL, '
+            'created_at REAL NOT NULL)'
+        )
+        self.conn.commit()
+
+    def lookup(self, code):
+        with self.lock:
+            row = self.conn.execute(
+                'SELECT creator, video_id, created_at FROM short_links WHERE code = ?', (code,)
+            ).fetchone()
+            
+            if row is None or (self.ttl and time.time() - row[2] > self.ttl):
+                self.misses += 1
+                metrics.record_cache('short_link', False)
+                return None
+            
+            self.hits += 1
+            metrics.record_cache('short_link', True)
+            return row[0], row[1]
+
+    def store(self, code, creator, video_id):
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO short_links (code, creator, video_id, created_at) VALUES (?, ?, ?, ?)',
+                (code, creator, video_id, now)
+            )
+            if self.ttl:
+                self.conn.execute('DELETE FROM short_links WHERE created_at < ?', (now - self.ttl,))
+            self.conn.commit()
+
+    @property
+    def session(self):
+        session = getattr(self.local, 'session', None)
+        if session is None:
+            session = self.local.session = requests.Session()
+            session.mount('https://', self.adapter)
+            session.mount('http://', self.adapter)
+        return session
+
+    def cached_url(self, url):
+        code = short_code(url)
+        if code is None:
+            return url, None
+        
+        cached = self.lookup(code)
+        if cached:
+            return canonical_video_url(*cached), code
+        return None, code
+
+    def remember(self, code, url, location):
+        parsed = parse_video_url(location) if location else None
+        if parsed is None:
+            logger.warning(f"Could not resolve short link {url} (last location: {location})")
+            return url
+        
+        self.store(code, *parsed)
+        return canonical_video_url(*parsed)
+
+    def resolve(self, url):
+        resolved, code = self.cached_url(url)
+        if resolved:
+            return resolved
+        
+        session = self.session
+        location = url
+        try:
+            for _ in range(MAX_REDIRECTS):
+                response = session.head(location, allow_redirects=False, timeout=self.timeout)
+                if response.status_code == 405:
+                    response = session.get(location, allow_redirects=False, stream=True, timeout=self.timeout)
+                    response.close()
+                
+                next_location = response.headers.get('location')
+                if not next_location:
+                    break
+                location = urljoin(location, next_location)
+                if parse_video_url(location):
+                    break
+        except requests.RequestException as e:
+            logger.warning(f"Error resolving short link {url}: {e}")
+            return url
+        
+        return self.remember(code, url, location)
+
+    async def resolve_async(self, url, client):
+        if short_code(url) is None:
+            return url
+        
+        # The SQLite cache commits on every store, so keep it off the event loop.
+        resolved, code = await asyncio.to_thread(self.cached_url, url)
+        if resolved:
+            return resolved
+        
+        location = url
+        try:
+            for _ in range(MAX_REDIRECTS):
+                response = await client.head(location, follow_redirects=False, timeout=self.timeout)
+                if response.status_code == 405:
+                    async with client.stream('GET', location, follow_redirects=False, timeout=self.timeout) as response:
+                        pass
+                
+                next_location = response.headers.get('location')
+                if not next_location:
+                    break
+                location = urljoin(location, next_location)
+                if parse_video_url(location):
+                    break
+        except Exception as e:
+            logger.warning(f"Error resolving short link {url}: {e}")
+            return url
+        
+        return await asyncio.to_thread(self.remember, code, url, location)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+        self.adapter.close()
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+
+import hashlib
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+            size += len(chunk)
+    return digest.hexdigest(), size
+
+
+def link_atomic(src, dst):
+    # Build the link under a temporary name so readers of dst never see a missing or partial file.
+    tmp = f"{dst}.{os.getpid()}.tmp"
+    try:
+        os.link(src, tmp)
+    except OSError:
+        shutil.copyfile(src, tmp)
+    os.replace(tmp, dst)
+
+
+class MediaStore:
+    def __init__(self, root="downloads/.store", quota=5 * 1024 ** 3):
+        self.root = root
+        self.quota = quota
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+        os.makedirs(os.path.join(root, 'objects'), exist_ok=True)
+
+        self.conn = sqlite3.connect(os.path.join(root, 'index.db'), check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS media ('
+            'key TEXT PRIMARY KEY, '
+            'digest TEXT NOT NULL, '
+            'path TEXT NOT NULL, '
+            'size INTEGER NOT NULL, '
+            'created_at REAL NOT NULL, '
+            'last_access REAL NOT NULL)'
+        )
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_media_last_access ON media (last_access)')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_media_digest ON media (digest)')
+        self.conn.commit()
+
+    def object_path(self, digest):
+        return os.path.join(self.root, 'objects', digest[:2], f"{digest}.mp4")
+
+    def get(self, key, path=None):
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute('SELECT digest, path, size FROM media WHERE key = ?', (key,)).fetchone()
+
+            if row is None or not os.path.exists(self.object_path(row[0])):
+                if row is not None:
+                    self.conn.execute('DELETE FROM media WHERE key = ?', (key,))
+                    self.conn.commit()
+                self.misses += 1
+                metrics.record_cache('media_store', False)
+                return None
+
+            digest, stored_path, size = row
+            if not os.path.exists(stored_path):
+                stored_path = path or stored_path
+                if not os.path.exists(stored_path):
+                    link_atomic(self.object_path(digest), stored_path)
+
+            self.conn.execute(
+                'UPDATE media SET path = ?, last_access = ? WHERE key = ?', (stored_path, now, key)
+            )
+            self.conn.commit()
+            self.hits += 1
+            metrics.record_cache('media_store', True)
+            return {'path': stored_path, 'digest': digest, 'size': size}
+
+    def put(self, key, path):
+        digest, size = file_digest(path)
+        object_path = self.object_path(digest)
+        now = time.time()
+
+        with self.lock:
+            previous = self.conn.execute('SELECT digest FROM media WHERE key = ?', (key,)).fetchone()
+
+            os.makedirs(os.path.dirname(object_path), exist_ok=True)
+            if not os.path.exists(object_path):
+                link_atomic(path, object_path)
+            elif not os.path.samefile(object_path, path):
+                logger.info(f"Deduplicated {path} against stored object {digest[:12]}")
+                link_atomic(object_path, path)
+
+            self.conn.execute(
+                'INSERT OR REPLACE INTO media (key, digest, path, size, created_at, last_access) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (key, digest, path, size, now, now)
+            )
+            if previous and previous[0] != digest:
+                self._remove_orphan(previous[0])
+            self._evict(key)
+            self.conn.commit()
+
+        return {'path': path, 'digest': digest, 'size': size}
+
+    def delete(self, key):
+        with self.lock:
+            row = self.conn.execute('SELECT digest, path FROM media WHERE key = ?', (key,)).fetchone()
+            if row is not None:
+                self._remove(key, *row)
+                self.conn.commit()
+
+    def total_size(self):
+        return self.conn.execute(
+            'SELECT COALESCE(SUM(size), 0) FROM (SELECT DISTINCT digest, size FROM media)'
+        ).fetchone()[0]
+
+    def _remove(self, key, digest, path):
+        self.conn.execute('DELETE FROM media WHERE key = ?', (key,))
+        if os.path.exists(path):
+            os.remove(path)
+
+        return self._remove_orphan(digest)
+
+    def _remove_orphan(self, digest):
+        shared = self.conn.execute('SELECT 1 FROM media WHERE digest = ? LIMIT 1', (digest,)).fetchone()
+        object_path = self.object_path(digest)
+        if shared is None and os.path.exists(object_path):
+            os.remove(object_path)
+            return True
+        return False
+
+    def _evict(self, keep):
+        if not self.quota:
+            return
+
+        total = self.total_size()
+        if total <= self.quota:
+            return
+
+        rows = self.conn.execute(
+            'SELECT key, digest, path, size FROM media WHERE key != ? ORDER BY last_access', (keep,)
+        ).fetchall()
+        for key, digest, path, size in rows:
+            if total <= self.quota:
+                break
+            if self._remove(key, digest, path):
+                total -= size
+            logger.info(f"Evicted {path} from media store ({total / 1024 / 1024:.1f} MB in use)")
+
+    def stats(self):
+        with self.lock:
+            entries, objects = self.conn.execute(
+                'SELECT COUNT(*), COUNT(DISTINCT digest) FROM media'
+            ).fetchone()
+            total = self.total_size()
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': entries,
+            'objects': objects,
+            'bytes': total,
+            'quota': self.quota,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+
+import logging
+import os
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+try:
+    from prometheus_client import REGISTRY, Counter, Histogram, start_http_server
+    from prometheus_client.core import GaugeMetricFamily
+except ImportError:
+    REGISTRY = None
+
+try:
+    from opentelemetry import trace
+except ImportError:
+    trace = None
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+THROUGHPUT_BUCKETS = tuple(2 ** power * 1024 for power in range(4, 16))
+
+
+class NoopMetric:
+    def labels(self, *args, **kwargs):
+        return self
+
+    def observe(self, value):
+        pass
+
+    def inc(self, amount=1):
+        pass
+
+
+if REGISTRY is not None:
+    STAGE_SECONDS = Histogram(
+        'tiktok_stage_seconds', 'Time spent in each processing stage', ['stage'], buckets=LATENCY_BUCKETS
+    )
+    DOWNLOAD_THROUGHPUT = Histogram(
+        'tiktok_download_bytes_per_second', 'CDN download throughput per video', buckets=THROUGHPUT_BUCKETS
+    )
+    REQUESTS = Counter('tiktok_requests_total', 'Handled requests by outcome and reason', ['outcome', 'reason'])
+    CACHE_LOOKUPS = Counter('tiktok_cache_lookups_total', 'Cache lookups by cache and result', ['cache', 'result'])
+    BYTES = Counter('tiktok_bytes_total', 'Bytes transferred by direction', ['direction'])
+else:
+    STAGE_SECONDS = DOWNLOAD_THROUGHPUT = REQUESTS = CACHE_LOOKUPS = BYTES = NoopMetric()
+
+tracer = None
+
+
+class StatsCollector:
+    def __init__(self, prefix, func, label=None):
+        self.prefix = prefix
+        self.func = func
+        self.label = label
+
+    def collect(self):
+        try:
+            stats = self.func()
+        except Exception as e:
+            logger.warning(f"Could not collect {self.prefix} stats: {e}")
+            return
+        
+        if self.label is None:
+            for key, value in stats.items():
+                if isinstance(value, (int, float)):
+                    yield GaugeMetricFamily(f'{self.prefix}_{key}', f'{self.prefix} {key}', value=value)
+            return
+        
+        families = {}
+        for label_value, values in stats.items():
+            for key, value in values.items():
+                if not isinstance(value, (int, float)):
+                    continue
+                family = families.get(key)
+                if family is None:
+                    family = families[key] = GaugeMetricFamily(
+                        f'{self.prefix}_{key}', f'{self.prefix} {key}', labels=[self.label]
+                    )
+                family.add_metric([str(label_value)], value)
+        yield from families.values()
+
+
+def register_stats(prefix, func, label=None):
+    if REGISTRY is not None:
+        REGISTRY.register(StatsCollector(prefix, func, label))
+
+
+def start_metrics_server(port, addr='127.0.0.1'):
+    if REGISTRY is None:
+        logger.warning("prometheus_client is not installed, metrics endpoint disabled")
+        return False
+    start_http_server(port, addr=addr)
+    logger.info(f"Prometheus metrics available at http://{addr}:{port}/metrics")
+    return True
+
+
+def setup_tracing(service_name='tiktok-downloader'):
+    global tracer
+    
+    if not os.getenv('OTEL_EXPORTER_OTLP_ENDPOINT'):
+        return False
+    
+    try:
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    except ImportError:
+        logger.warning("OTEL_EXPORTER_OTLP_ENDPOINT is set but opentelemetry-sdk/exporter are not installed")
+        return False
+    
+    provider = TracerProvider(resource=Resource.create({'service.name': service_name}))
+    provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+    trace.set_tracer_provider(provider)
+    tracer = trace.get_tracer(__name__)
+    logger.info("OpenTelemetry trace export enabled")
+    return True
+
+
+@contextmanager
+def span(stage, **attributes):
+    start = time.monotonic()
+    if tracer is None:
+        try:
+            yield
+        finally:
+            STAGE_SECONDS.labels(stage).observe(time.monotonic() - start)
+        return
+    
+    with tracer.start_as_current_span(stage, attributes=attributes):
+        try:
+            yield
+        finally:
+            STAGE_SECONDS.labels(stage).observe(time.monotonic() - start)
+
+
+def observe(stage, seconds):
+    STAGE_SECONDS.labels(stage).observe(seconds)
+
+
+def record_request(outcome, reason):
+    REQUESTS.labels(outcome, reason).inc()
+
+
+def record_cache(cache, hit):
+    CACHE_LOOKUPS.labels(cache, 'hit' if hit else 'miss').inc()
+
+
+def record_bytes(direction, count):
+    if count:
+        BYTES.labels(direction).inc(count)
+
+
+def record_download(size, seconds):
+    record_bytes('download', size)
+    if size and seconds > 0:
+        DOWNLOAD_THROUGHPUT.observe(size / seconds)
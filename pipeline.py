@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+
+import logging
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+STOP = object()
+
+
+class Stage:
+    def __init__(self, name, func, workers=1, queue_size=100):
+        self.name = name
+        self.func = func
+        self.workers = workers
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.next = None
+        self.sink = None
+        self.threads = []
+        self.lock = threading.Lock()
+        self.running_workers = 0
+        
+        self.processed = 0
+        self.failed = 0
+        self.busy_time = 0.0
+        self.started_at = None
+
+    def start(self):
+        self.started_at = time.monotonic()
+        self.running_workers = self.workers
+        for i in range(self.workers):
+            thread = threading.Thread(target=self.work, name=f"{self.name}-{i}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def put(self, item):
+        self.queue.put(item)
+
+    def work(self):
+        while True:
+            item = self.queue.get()
+            if item is STOP:
+                break
+            
+            start = time.monotonic()
+            try:
+                self.func(item)
+            except Exception as e:
+                logger.error(f"Stage {self.name} failed: {e}", exc_info=True)
+                item.error = item.error or str(e)
+            elapsed = time.monotonic() - start
+            
+            with self.lock:
+                self.busy_time += elapsed
+                if item.error:
+                    self.failed += 1
+                else:
+                    self.processed += 1
+            
+            if item.error or item.done:
+                target = self.sink if self.sink is not self else None
+            else:
+                target = self.next
+            if target is not None:
+                target.put(item)
+        
+        with self.lock:
+            self.running_workers -= 1
+            last = self.running_workers == 0
+        
+        if last and self.next is not None:
+            for _ in range(self.next.workers):
+                self.next.put(STOP)
+
+    def join(self):
+        for thread in self.threads:
+            thread.join()
+
+    def stats(self):
+        elapsed = time.monotonic() - self.started_at if self.started_at else 0.0
+        handled = self.processed + self.failed
+        return {
+            'workers': self.workers,
+            'queue_depth': self.queue.qsize(),
+            'processed': self.processed,
+            'failed': self.failed,
+            'throughput': handled / elapsed if elapsed else 0.0,
+            'utilization': self.busy_time / (elapsed * self.workers) if elapsed else 0.0
+        }
+
+
+class PipelineItem:
+    def __init__(self, url):
+        self.url = url
+        self.error = None
+        self.done = False
+        self.data = {}
+        self.created_at = time.monotonic()
+
+
+class Pipeline:
+    def __init__(self, stages):
+        self.stages = stages
+        for stage, next_stage in zip(stages, stages[1:]):
+            stage.next = next_stage
+        for stage in stages:
+            stage.sink = stages[-1]
+
+    def run(self, urls, report=None, report_interval=10.0):
+        for stage in self.stages:
+            stage.start()
+        
+        done = threading.Event()
+        if report and report_interval:
+            threading.Thread(
+                target=self.report_loop, args=(report, report_interval, done), name='pipeline-stats', daemon=True
+            ).start()
+        
+        try:
+            first = self.stages[0]
+            for url in urls:
+                first.put(PipelineItem(url))
+            for _ in range(first.workers):
+                first.put(STOP)
+            
+            for stage in self.stages:
+                stage.join()
+        finally:
+            done.set()
+
+    def report_loop(self, report, interval, done):
+        # Queue depths are only meaningful while the run is in progress, so report periodically.
+        while not done.wait(interval):
+            report(self.stats())
+
+    def stats(self):
+        return {stage.name: stage.stats() for stage in self.stages}
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+
+import time
+
+
+class ProgressThrottle:
+    def __init__(self, callback, interval=0.5, step=1.0):
+        # Report at most once per `interval` seconds, and only after `step` percent more of a known size.
+        self.callback = callback
+        self.interval = interval
+        self.step = step
+        self.last_time = time.monotonic()
+        self.last_percent = 0.0
+        self.reported = None
+
+    def update(self, downloaded, total=None):
+        if total:
+            percent = downloaded / total * 100
+            if percent - self.last_percent < self.step:
+                return
+        else:
+            percent = None
+
+        now = time.monotonic()
+        if now - self.last_time < self.interval:
+            return
+
+        self.last_time = now
+        if percent is not None:
+            self.last_percent = percent
+        self.reported = downloaded
+        self.callback(downloaded, total)
+
+    def finish(self, size):
+        if self.reported != size:
+            self.reported = size
+            self.callback(size, size)
+
+
+def print_progress(downloaded, total):
+    if total:
+        print(f"\r[*] Download progress: {downloaded / total * 100:.1f}%", end='', flush=True)
+        if downloaded >= total:
+            print()
+    else:
+        print(f"\r[*] Downloaded {downloaded / 1024 / 1024:.2f} MB", end='', flush=True)
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+
+import abc
+import asyncio
+import logging
+import time
+
+from rate_limit import HostRateLimiter
+from tiktok_downloader import DEFAULT_SCRAPE_BURST, DEFAULT_SCRAPE_RATE, AsyncTikTokDownloader
+from video_info import VideoInfo
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class ProviderError(Exception):
+    pass
+
+
+class NoDownloadLinkError(ProviderError):
+    pass
+
+
+def best_download_url(variants):
+    best = VideoInfo(None, variants=variants).best_variant()
+    return (best or variants[0])['url']
+
+
+class DownloadProvider(abc.ABC):
+    name = 'provider'
+
+    async def acquire(self):
+        pass
+
+    @abc.abstractmethod
+    async def resolve_variants(self, tiktok_url):
+        pass
+
+    async def resolve(self, tiktok_url):
+        return best_download_url(await self.resolve_variants(tiktok_url))
+
+    async def aclose(self):
+        pass
+
+
+class AjaxSearchProvider(DownloadProvider):
+    def __init__(self, base_url, client=None, name=None, rate_limiter=None, max_retries=0):
+        # Retries are left to ProviderSelector, which fails over to the next provider instead.
+        # The selector takes rate limiter tokens through acquire() so queueing is not timed as latency.
+        self.name = name or base_url
+        self.rate_limiter = rate_limiter or HostRateLimiter(DEFAULT_SCRAPE_RATE, DEFAULT_SCRAPE_BURST)
+        self.downloader = AsyncTikTokDownloader(
+            base_url=base_url, client=client, rate_limiter=HostRateLimiter(0), max_retries=max_retries
+        )
+
+    async def acquire(self):
+        await self.rate_limiter.acquire_async(self.downloader.base_url)
+
+    async def resolve_variants(self, tiktok_url):
+        response_data = await self.downloader.get_download_page(tiktok_url)
+        if not response_data:
+            raise ProviderError(f"{self.name}: ajaxSearch request failed")
+        
+        variants = await self.downloader.extract_download_variants(response_data)
+        if not variants:
+            raise NoDownloadLinkError(f"{self.name}: no download link in response")
+        return variants
+
+    async def aclose(self):
+        await self.downloader.aclose()
+
+
+class ProviderHealth:
+    def __init__(self, provider, alpha=0.3, failure_threshold=5, reset_timeout=30.0):
+        self.provider = provider
+        self.alpha = alpha
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        
+        self.latency = None
+        self.error_rate = 0.0
+        self.consecutive_failures = 0
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.probing = False
+        self.requests = 0
+        self.failures = 0
+
+    def available(self, now):
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and now - self.opened_at >= self.reset_timeout:
+            self.state = HALF_OPEN
+            self.probing = False
+        return self.state == HALF_OPEN and not self.probing
+
+    def score(self, error_penalty):
+        return (self.latency or 0.0) + self.error_rate * error_penalty
+
+    def record_latency(self, latency):
+        self.latency = latency if self.latency is None else self.alpha * latency + (1 - self.alpha) * self.latency
+
+    def record_success(self, latency):
+        self.requests += 1
+        self.record_latency(latency)
+        self.error_rate = (1 - self.alpha) * self.error_rate
+        self.consecutive_failures = 0
+        self.probing = False
+        if self.state != CLOSED:
+            logger.info(f"Circuit closed for provider {self.provider.name}")
+        self.state = CLOSED
+
+    def record_failure(self, now):
+        self.requests += 1
+        self.failures += 1
+        self.error_rate = self.alpha + (1 - self.alpha) * self.error_rate
+        self.consecutive_failures += 1
+        self.probing = False
+        if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != OPEN:
+                logger.warning(f"Circuit opened for provider {self.provider.name} after {self.consecutive_failures} failures")
+            self.state = OPEN
+            self.opened_at = now
+
+    def snapshot(self):
+        return {
+            'latency_ewma': self.latency,
+            'error_rate_ewma': self.error_rate,
+            'state': self.state,
+            'requests': self.requests,
+            'failures': self.failures
+        }
+
+
+class ProviderSelector:
+    def __init__(self, providers, hedge_delay=3.0, failure_threshold=5, reset_timeout=30.0,
+                 alpha=0.3, error_penalty=10.0):
+        self.hedge_delay = hedge_delay
+        self.error_penalty = error_penalty
+        self.health = [
+            ProviderHealth(provider, alpha, failure_threshold, reset_timeout)
+            for provider in providers
+        ]
+
+    def ranked(self):
+        now = time.monotonic()
+        available = [health for health in self.health if health.available(now)]
+        return sorted(available, key=lambda health: health.score(self.error_penalty))
+
+    async def acquire(self, health):
+        if health.state == HALF_OPEN:
+            health.probing = True
+        
+        try:
+            await health.provider.acquire()
+        except asyncio.CancelledError:
+            health.probing = False
+            raise
+
+    async def call(self, health, tiktok_url, acquired=False):
+        # Local rate limiting is not provider latency, so it is waited out before the clock starts.
+        if not acquired:
+            await self.acquire(health)
+        
+        start = time.monotonic()
+        try:
+            result = await health.provider.resolve_variants(tiktok_url)
+        except asyncio.CancelledError:
+            # Lost a hedge race: the elapsed time is a lower bound on its latency.
+            health.record_latency(time.monotonic() - start)
+            health.probing = False
+            raise
+        except NoDownloadLinkError:
+            health.record_success(time.monotonic() - start)
+            raise
+        except Exception as e:
+            health.record_failure(time.monotonic())
+            if isinstance(e, ProviderError):
+                raise
+            raise ProviderError(f"{health.provider.name}: {e}") from e
+        
+        health.record_success(time.monotonic() - start)
+        return result
+
+    async def resolve(self, tiktok_url):
+        return best_download_url(await self.resolve_variants(tiktok_url))
+
+    async def resolve_variants(self, tiktok_url):
+        remaining = self.ranked()
+        if not remaining:
+            raise ProviderError("No healthy download providers available")
+        
+        pending = {}
+        errors = []
+        
+        def launch(acquired=False):
+            health = remaining.pop(0)
+            task = asyncio.ensure_future(self.call(health, tiktok_url, acquired))
+            pending[task] = health
+        
+        # Wait for the first provider's rate limiter token before the hedge clock starts.
+        await self.acquire(remaining[0])
+        launch(acquired=True)
+        try:
+            while pending:
+                timeout = self.hedge_delay if remaining else None
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                
+                if not done:
+                    logger.info(f"Hedging {tiktok_url} to provider {remaining[0].provider.name}")
+                    launch()
+                    continue
+                
+                for task in done:
+                    pending.pop(task)
+                    if task.exception() is None:
+                        return task.result()
+                    errors.append(task.exception())
+                    if remaining:
+                        launch()
+            
+            if all(isinstance(error, NoDownloadLinkError) for error in errors):
+                raise NoDownloadLinkError("; ".join(str(error) for error in errors))
+            raise ProviderError("All download providers failed: " + "; ".join(str(error) for error in errors))
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stats(self):
+        return {health.provider.name: health.snapshot() for health in self.health}
+
+    async def aclose(self):
+        for health in self.health:
+            await health.provider.aclose()
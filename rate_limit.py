@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+
+import asyncio
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self, tokens=1):
+        with self.lock:
+            self._refill(time.monotonic())
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return True
+            return False
+
+    def retry_after(self, tokens=1):
+        with self.lock:
+            self._refill(time.monotonic())
+            missing = tokens - self.tokens
+            return max(0.0, missing / self.rate) if self.rate else float('inf')
+
+    def reserve(self, tokens=1):
+        with self.lock:
+            self._refill(time.monotonic())
+            self.tokens -= tokens
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+    def acquire(self, tokens=1):
+        delay = self.reserve(tokens)
+        if delay:
+            time.sleep(delay)
+
+    async def acquire_async(self, tokens=1):
+        delay = self.reserve(tokens)
+        if delay:
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                # A caller cancelled while queued (e.g. a losing hedge) never used its token.
+                self.refund(tokens)
+                raise
+
+    def refund(self, tokens=1):
+        with self.lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.capacity, self.tokens + tokens)
+
+    def is_full(self):
+        with self.lock:
+            self._refill(time.monotonic())
+            return self.tokens >= self.capacity
+
+
+class HostRateLimiter:
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def bucket(self, url):
+        host = urlsplit(url).netloc or url
+        with self.lock:
+            bucket = self.buckets.get(host)
+            if bucket is None:
+                bucket = self.buckets[host] = TokenBucket(self.rate, self.burst)
+            return bucket
+
+    def acquire(self, url):
+        if self.rate:
+            self.bucket(url).acquire()
+
+    async def acquire_async(self, url):
+        if self.rate:
+            await self.bucket(url).acquire_async()
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+
+from rate_limit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class RateLimitedError(Exception):
+    def __init__(self, retry_after):
+        super().__init__(f"Rate limit exceeded, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class Job:
+    def __init__(self, scheduler, user_id):
+        self.scheduler = scheduler
+        self.user_id = user_id
+        self.ready = asyncio.get_running_loop().create_future()
+        self.enqueued_at = time.monotonic()
+        self.started_at = None
+        self.finished = False
+
+    @property
+    def position(self):
+        return self.scheduler.position(self)
+
+    @property
+    def wait_time(self):
+        end = self.started_at if self.started_at is not None else time.monotonic()
+        return end - self.enqueued_at
+
+    async def __aenter__(self):
+        try:
+            await self.ready
+        except BaseException:
+            self.scheduler.release(self)
+            raise
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.scheduler.release(self)
+        return False
+
+
+class JobScheduler:
+    def __init__(self, max_concurrent=4, max_per_user=2, max_queue=100,
+                 user_rate=10 / 60, user_burst=5):
+        self.max_concurrent = max_concurrent
+        self.max_per_user = max_per_user
+        self.max_queue = max_queue
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        
+        self.queues = OrderedDict()
+        self.active = {}
+        self.buckets = {}
+        self.running = 0
+        
+        self.submitted = 0
+        self.started = 0
+        self.completed = 0
+        self.rejected_full = 0
+        self.rejected_rate = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+
+    def queued(self):
+        return sum(len(queue) for queue in self.queues.values())
+
+    def submit(self, user_id):
+        if self.user_rate:
+            bucket = self.buckets.get(user_id)
+            if bucket is None:
+                bucket = self.buckets[user_id] = TokenBucket(self.user_rate, self.user_burst)
+            if not bucket.try_acquire():
+                self.rejected_rate += 1
+                raise RateLimitedError(bucket.retry_after())
+        
+        if self.max_queue is not None and self.queued() >= self.max_queue:
+            self.rejected_full += 1
+            raise QueueFullError(f"Download queue is full ({self.max_queue} jobs)")
+        
+        job = Job(self, user_id)
+        self.queues.setdefault(user_id, deque()).append(job)
+        self.submitted += 1
+        self._dispatch()
+        return job
+
+    def position(self, job):
+        if job.started_at is not None or job.finished:
+            return 0
+        
+        queue = self.queues.get(job.user_id)
+        if not queue or job not in queue:
+            return 0
+        
+        index = queue.index(job)
+        ahead = index
+        before = True
+        for user_id, other in self.queues.items():
+            if user_id == job.user_id:
+                before = False
+                continue
+            ahead += min(len(other), index + 1 if before else index)
+        return ahead + 1
+
+    def release(self, job):
+        if job.finished:
+            return
+        job.finished = True
+        
+        if job.started_at is None:
+            queue = self.queues.get(job.user_id)
+            if queue and job in queue:
+                queue.remove(job)
+                if not queue:
+                    del self.queues[job.user_id]
+            return
+        
+        self.running -= 1
+        self.completed += 1
+        self.active[job.user_id] -= 1
+        if not self.active[job.user_id]:
+            del self.active[job.user_id]
+        self._dispatch()
+
+    def _dispatch(self):
+        while self.running < self.max_concurrent:
+            job = self._next_job()
+            if job is None:
+                break
+            
+            job.started_at = time.monotonic()
+            self.running += 1
+            self.started += 1
+            self.active[job.user_id] = self.active.get(job.user_id, 0) + 1
+            
+            wait = job.wait_time
+            self.wait_time_total += wait
+            self.wait_time_max = max(self.wait_time_max, wait)
+            
+            if not job.ready.done():
+                job.ready.set_result(None)
+        
+        self._prune_buckets()
+
+    def _next_job(self):
+        for user_id in list(self.queues):
+            if self.active.get(user_id, 0) >= self.max_per_user:
+                continue
+            
+            queue = self.queues.pop(user_id)
+            job = queue.popleft()
+            if queue:
+                self.queues[user_id] = queue
+            return job
+        return None
+
+    def _prune_buckets(self):
+        if len(self.buckets) < 10000:
+            return
+        for user_id in [u for u, bucket in self.buckets.items() if bucket.is_full()]:
+            del self.buckets[user_id]
+
+    def metrics(self):
+        return {
+            'queue_depth': self.queued(),
+            'running': self.running,
+            'submitted': self.submitted,
+            'completed': self.completed,
+            'rejected_queue_full': self.rejected_full,
+            'rejected_rate_limited': self.rejected_rate,
+            'wait_time_avg': self.wait_time_total / self.started if self.started else 0.0,
+            'wait_time_max': self.wait_time_max
+        }
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    def __init__(self, task, cleanup):
+        self.task = task
+        self.cleanup = cleanup
+        self.waiters = 0
+
+
+class _Flight:
+    def __init__(self, group, key, factory, cleanup):
+        self.group = group
+        self.key = key
+        self.factory = factory
+        self.cleanup = cleanup
+        self.call = None
+        self.leader = False
+
+    async def __aenter__(self):
+        call = self.group.calls.get(self.key)
+        if call is None:
+            call = _Call(asyncio.ensure_future(self.factory()), self.cleanup)
+            self.group.calls[self.key] = call
+            self.leader = True
+        
+        call.waiters += 1
+        self.call = call
+        
+        try:
+            return await asyncio.shield(call.task)
+        except BaseException:
+            self._release()
+            raise
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._release()
+        return False
+
+    def _release(self):
+        call = self.call
+        if call is None:
+            return
+        self.call = None
+        
+        call.waiters -= 1
+        if call.waiters > 0:
+            return
+        
+        if self.group.calls.get(self.key) is call:
+            del self.group.calls[self.key]
+        
+        if not call.task.done():
+            call.task.cancel()
+        
+        if call.cleanup:
+            result = None
+            if call.task.done() and not call.task.cancelled() and call.task.exception() is None:
+                result = call.task.result()
+            try:
+                call.cleanup(result)
+            except Exception as e:
+                logger.error(f"Cleanup failed for {self.key}: {e}")
+
+
+class SingleFlight:
+    def __init__(self):
+        self.calls = {}
+
+    def join(self, key, factory, cleanup=None):
+        return _Flight(self, key, factory, cleanup)
+
+    def waiters(self, key):
+        call = self.calls.get(key)
+        return call.waiters if call else 0
+
+    def __len__(self):
+        return len(self.calls)
@@ -1,11 +1,22 @@
 #!/usr/bin/env python3
 
+import asyncio
 import os
 import re
 import logging
 from telegram import Update
+from telegram.error import BadRequest, TelegramError
 from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes
-from tiktok_downloader import TikTokDownloader
+from tiktok_downloader import AsyncTikTokDownloader, FileTooLargeError, BASE_URL
+from providers import AjaxSearchProvider, ProviderSelector
+from rate_limit import HostRateLimiter
+from video_cache import FileIdCache
+from video_info import VideoInfoCache
+from media_store import MediaStore
+from singleflight import SingleFlight
+from scheduler import JobScheduler, QueueFullError, RateLimitedError
+from link_resolver import ShortLinkResolver, parse_video_url
+import metrics
 
 logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
@@ -13,26 +24,107 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+MAX_UPLOAD_SIZE = 50 * 1024 * 1024
+PROCESSING_TEXT = (
+    "Processing your request...\n"
+    "Downloading video in HD quality..."
+)
+
+
+class ProgressMessage:
+    def __init__(self, message):
+        self.message = message
+        self.task = None
+    
+    def __call__(self, downloaded, total):
+        if total:
+            text = f"Downloading video in HD quality...\n{downloaded / total * 100:.0f}% of {total / (1024 * 1024):.1f} MB"
+        else:
+            text = f"Downloading video in HD quality...\n{downloaded / (1024 * 1024):.1f} MB"
+        self.post(text)
+    
+    def post(self, text):
+        # Drop updates while an edit is still in flight rather than queueing them behind Telegram.
+        if self.task and not self.task.done():
+            return
+        self.task = asyncio.create_task(self.edit(text))
+    
+    async def edit(self, text):
+        try:
+            await self.message.edit_text(text)
+        except TelegramError as e:
+            logger.debug(f"Progress update skipped: {e}")
+    
+    async def close(self):
+        if self.task:
+            await self.task
+
 
 class TikTokBot:
     def __init__(self, token):
         self.token = token
-        self.downloader = TikTokDownloader()
+        self.api_url = os.getenv('TELEGRAM_API_URL') or None
+        self.downloader = AsyncTikTokDownloader(
+            max_connections=int(os.getenv('MAX_CONNECTIONS', '100')),
+            chunk_size=int(os.getenv('DOWNLOAD_CHUNK_SIZE', str(256 * 1024))),
+            spool_size=int(os.getenv('SPOOL_MEMORY_LIMIT', str(MAX_UPLOAD_SIZE))),
+            spool_dir=os.getenv('SPOOL_DIR') or None,
+            progress_interval=float(os.getenv('PROGRESS_EDIT_INTERVAL', '3')),
+            progress_step=float(os.getenv('PROGRESS_EDIT_STEP', '5')),
+            info_cache=VideoInfoCache(ttl=int(os.getenv('VIDEO_INFO_CACHE_TTL', '300')))
+        )
+        provider_urls = [url.strip() for url in os.getenv('PROVIDER_URLS', BASE_URL).split(',') if url.strip()]
+        scrape_limiter = HostRateLimiter(
+            float(os.getenv('SCRAPE_RATE_PER_SECOND', '2')),
+            int(os.getenv('SCRAPE_BURST', '5'))
+        )
+        self.providers = ProviderSelector(
+            [AjaxSearchProvider(url, client=self.downloader.client, rate_limiter=scrape_limiter) for url in provider_urls],
+            hedge_delay=float(os.getenv('PROVIDER_HEDGE_DELAY', '3')),
+            failure_threshold=int(os.getenv('PROVIDER_FAILURE_THRESHOLD', '5')),
+            reset_timeout=float(os.getenv('PROVIDER_RESET_TIMEOUT', '30'))
+        )
+        self.downloader.link_provider = self.providers
         self.download_dir = "downloads"
+        self.work_dir = None
         self.local_mode = os.getenv('LOCAL', 'false').lower() == 'true'
+        self.stream_upload = not self.local_mode and os.getenv('STREAM_UPLOAD', 'true').lower() == 'true'
+        self.concurrent_updates = int(os.getenv('CONCURRENT_UPDATES', '64'))
+        self.inflight = SingleFlight()
+        self.resolver = ShortLinkResolver(
+            path=os.getenv('SHORT_LINK_CACHE_PATH', 'cache/short_links.db'),
+            ttl=int(os.getenv('SHORT_LINK_CACHE_TTL', str(30 * 24 * 3600)))
+        )
+        self.scheduler = JobScheduler(
+            max_concurrent=int(os.getenv('MAX_CONCURRENT_DOWNLOADS', '4')),
+            max_per_user=int(os.getenv('MAX_DOWNLOADS_PER_USER', '2')),
+            max_queue=int(os.getenv('MAX_QUEUE_SIZE', '100')),
+            user_rate=float(os.getenv('USER_RATE_PER_MINUTE', '10')) / 60,
+            user_burst=int(os.getenv('USER_BURST', '5'))
+        )
+        self.file_id_cache = FileIdCache(
+            path=os.getenv('FILE_ID_CACHE_PATH', 'cache/file_ids.db'),
+            ttl=int(os.getenv('FILE_ID_CACHE_TTL', str(7 * 24 * 3600))),
+            max_entries=int(os.getenv('FILE_ID_CACHE_SIZE', '10000'))
+        )
+        self.media_store = MediaStore(
+            root=os.getenv('MEDIA_STORE_PATH', os.path.join(self.download_dir, '.store')),
+            quota=int(os.getenv('MEDIA_STORE_QUOTA', str(5 * 1024 ** 3)))
+        ) if self.local_mode else None
+        
+        self.metrics_port = int(os.getenv('METRICS_PORT', '0'))
+        self.metrics_addr = os.getenv('METRICS_ADDR', '127.0.0.1')
         
         if not os.path.exists(self.download_dir):
             os.makedirs(self.download_dir)
     
     def extract_filename_from_url(self, url):
         try:
-            pattern = r'tiktok\.com/@([^/]+)/video/(\d+)'
-            match = re.search(pattern, url)
+            parsed = parse_video_url(url)
             
-            if match:
-                creator = match.group(1)
-                video_id = match.group(2)
-                filename = f"{creator}_{video_id}.mp4"
+            if parsed:
+                creator, video_id = parsed
+                filename = f"{creator}_{video_id}.mp4" if creator else f"tiktok_{video_id}.mp4"
                 return os.path.join(self.download_dir, filename)
             else:
                 import time
@@ -45,6 +137,66 @@ class TikTokBot:
             timestamp = int(time.time())
             return os.path.join(self.download_dir, f"tiktok_{timestamp}.mp4")
     
+    def extract_video_id(self, url):
+        parsed = parse_video_url(url)
+        if parsed:
+            return parsed[1]
+        return None
+    
+    def cache_key(self, url):
+        return self.extract_video_id(url) or url.split('?')[0]
+    
+    async def send_cached_video(self, update, tiktok_url, cache_key):
+        # SQLite commits block, so cache calls run off the event loop like the media store's.
+        cached = await asyncio.to_thread(self.file_id_cache.get, cache_key)
+        if not cached:
+            return False
+        
+        caption = f"Downloaded from: {tiktok_url.split('?')[0]}"
+        if cached['file_size']:
+            caption += f"\nSize: {cached['file_size'] / (1024 * 1024):.2f} MB"
+        
+        try:
+            await update.message.reply_video(
+                video=cached['file_id'],
+                caption=caption,
+                supports_streaming=True
+            )
+        except BadRequest as e:
+            logger.warning(f"Cached file_id for {cache_key} rejected, downloading again: {e}")
+            await asyncio.to_thread(self.file_id_cache.delete, cache_key)
+            return False
+        
+        metrics.record_request('success', 'file_id_cache')
+        logger.info(f"Served {cache_key} from file_id cache")
+        return True
+    
+    async def send_stored_video(self, update, tiktok_url, cache_key):
+        output_filename = self.extract_filename_from_url(tiktok_url)
+        stored = await asyncio.to_thread(self.media_store.get, cache_key, output_filename)
+        if not stored:
+            return False
+        
+        await update.message.reply_text(self.local_summary(stored['path'], stored['size']))
+        metrics.record_request('success', 'media_store')
+        logger.info(f"Served {cache_key} from media store ({stored['path']})")
+        return True
+    
+    async def store_download(self, tiktok_url, output_filename, cache_key, progress):
+        if not await self.downloader.download_tiktok_hd(tiktok_url, output_filename, progress=progress):
+            return False
+        await asyncio.to_thread(self.media_store.put, cache_key, output_filename)
+        return True
+    
+    def local_summary(self, path, file_size):
+        return (
+            f"Download complete!\n\n"
+            f"File: {os.path.basename(path)}\n"
+            f"Size: {file_size / (1024 * 1024):.2f} MB\n"
+            f"Location: {path}\n\n"
+            f"Video saved locally in downloads folder."
+        )
+    
     def is_tiktok_url(self, text):
         tiktok_patterns = [
             r'https?://(?:www\.)?tiktok\.com/@[^/]+/video/\d+',
@@ -104,6 +256,7 @@ class TikTokBot:
         text = update.message.text
         
         if not self.is_tiktok_url(text):
+            metrics.record_request('rejected', 'invalid_url')
             await update.message.reply_text(
                 "Please send me a valid TikTok video URL.\n\n"
                 "Use /help to see supported URL formats."
@@ -112,88 +265,277 @@ class TikTokBot:
         
         tiktok_url = self.extract_tiktok_url(text)
         if not tiktok_url:
+            metrics.record_request('rejected', 'invalid_url')
             await update.message.reply_text("Could not extract TikTok URL from your message.")
             return
         
-        processing_msg = await update.message.reply_text(
-            "Processing your request...\n"
-            "Downloading video in HD quality..."
+        with metrics.span('end_to_end'):
+            await self.handle_tiktok_url(update, tiktok_url)
+    
+    async def handle_tiktok_url(self, update, tiktok_url):
+        tiktok_url = await self.resolver.resolve_async(tiktok_url, self.downloader.client)
+        
+        cache_key = self.cache_key(tiktok_url)
+        if self.local_mode:
+            if await self.send_stored_video(update, tiktok_url, cache_key):
+                return
+        elif await self.send_cached_video(update, tiktok_url, cache_key):
+            return
+        
+        job = None
+        if not self.inflight.waiters(cache_key):
+            try:
+                job = self.scheduler.submit(update.effective_user.id)
+            except (RateLimitedError, QueueFullError) as e:
+                await update.message.reply_text(self.rejection_text(e))
+                return
+        
+        position = job.position if job else 0
+        try:
+            if position:
+                processing_msg = await update.message.reply_text(
+                    "Your request is queued.\n"
+                    f"Position in queue: {position}"
+                )
+            else:
+                processing_msg = await update.message.reply_text(PROCESSING_TEXT)
+        except Exception:
+            if job:
+                self.scheduler.release(job)
+            raise
+        
+        await self.process_download(update, processing_msg, tiktok_url, cache_key, job, position)
+    
+    def rejection_text(self, error):
+        if isinstance(error, RateLimitedError):
+            metrics.record_request('rejected', 'rate_limited')
+            return (
+                "You are sending links too quickly.\n"
+                f"Please try again in {max(1, round(error.retry_after))} seconds."
+            )
+        
+        metrics.record_request('rejected', 'queue_full')
+        logger.warning(f"Rejected request, queue full: {self.scheduler.metrics()}")
+        return (
+            "The bot is busy right now.\n"
+            "Please try again in a few minutes."
         )
+    
+    async def run_job(self, update, processing_msg, job, download, position=0):
+        # Runs as the single-flight leader, so duplicates of a queued link wait on this job instead of queueing their own.
+        # `position` is what the user was shown; the job may have started since, so it is not read again here.
+        if job is None:
+            job = self.scheduler.submit(update.effective_user.id)
+        
+        async with job:
+            if position:
+                logger.info(f"Job for user {job.user_id} waited {job.wait_time:.1f}s ({self.scheduler.metrics()})")
+                try:
+                    await processing_msg.edit_text(PROCESSING_TEXT)
+                except TelegramError as e:
+                    logger.debug(f"Queue update skipped: {e}")
+            return await download()
+    
+    async def process_download(self, update, processing_msg, tiktok_url, cache_key, job=None, position=0):
+        output_filename = self.extract_filename_from_url(tiktok_url)
+        progress = ProgressMessage(processing_msg)
+        
+        if self.stream_upload:
+            download = lambda: self.downloader.stream_tiktok_hd(tiktok_url, max_size=MAX_UPLOAD_SIZE, progress=progress)
+            cleanup = lambda buffer: buffer and buffer.close()
+            deliver = self.deliver_buffer
+        elif self.local_mode:
+            download = lambda: self.store_download(tiktok_url, output_filename, cache_key, progress)
+            cleanup = None
+            deliver = self.deliver_video
+        else:
+            # Uploaded files are scratch space; webhook workers each get their own so cleanups never collide.
+            output_filename = os.path.join(self.work_dir or self.download_dir, os.path.basename(output_filename))
+            download = lambda: self.downloader.download_tiktok_hd(
+                tiktok_url, output_filename, max_size=MAX_UPLOAD_SIZE, progress=progress
+            )
+            cleanup = lambda _: self.remove_file(output_filename)
+            deliver = self.deliver_video
+        
+        # No await between this check and entering the flight, so the leader decided here is the one that runs.
+        if self.inflight.waiters(cache_key):
+            logger.info(f"Joining in-flight download for {cache_key}")
+            if job:
+                self.scheduler.release(job)
+                job = None
+            if position:
+                # Replace the queue position shown earlier without awaiting before the flight is joined.
+                progress.post(PROCESSING_TEXT)
+                position = 0
+        else:
+            logger.info(f"Downloading {tiktok_url} ({'streaming' if self.stream_upload else output_filename})")
         
         try:
-            output_filename = self.extract_filename_from_url(tiktok_url)
-            logger.info(f"Downloading to: {output_filename}")
-            
-            success = self.downloader.download_tiktok_hd(tiktok_url, output_filename)
+            flight = self.inflight.join(
+                cache_key, lambda: self.run_job(update, processing_msg, job, download, position), cleanup=cleanup
+            )
             
-            if success and os.path.exists(output_filename):
-                file_size = os.path.getsize(output_filename)
-                file_size_mb = file_size / (1024 * 1024)
-                
-                if self.local_mode:
-                    await processing_msg.edit_text(
-                        f"Download complete!\n\n"
-                        f"File: {os.path.basename(output_filename)}\n"
-                        f"Size: {file_size_mb:.2f} MB\n"
-                        f"Location: {output_filename}\n\n"
-                        f"Video saved locally in downloads folder."
-                    )
-                    logger.info(f"Local mode: Video saved at {output_filename}")
-                else:
-                    await processing_msg.edit_text("Uploading video to Telegram...")
-                    
-                    if file_size_mb > 50:
-                        await processing_msg.edit_text(
-                            f"Video is too large ({file_size_mb:.2f} MB)\n"
-                            "Telegram bot limit is 50 MB.\n"
-                            "Please try a shorter video."
-                        )
-                        os.remove(output_filename)
-                        return
-                    
-                    with open(output_filename, 'rb') as video_file:
-                        caption = f"Downloaded from: {tiktok_url.split('?')[0]}\nSize: {file_size_mb:.2f} MB"
-                        await update.message.reply_video(
-                            video=video_file,
-                            caption=caption,
-                            supports_streaming=True
-                        )
-                    
-                    await processing_msg.delete()
-                    
-                    os.remove(output_filename)
-                    logger.info(f"Successfully sent video and cleaned up: {output_filename}")
-                
-            else:
-                await processing_msg.edit_text(
-                    "Failed to download the video.\n\n"
-                    "Possible reasons:\n"
-                    "The video is private\n"
-                    "The URL is invalid\n"
-                    "The video has been deleted\n"
-                    "Network issue\n\n"
-                    "Please try again with a different video."
+            async with flight as result:
+                await progress.close()
+                await deliver(
+                    update, processing_msg, tiktok_url, cache_key, output_filename, result,
+                    joined=not flight.leader
                 )
+        
+        except (RateLimitedError, QueueFullError) as e:
+            await processing_msg.edit_text(self.rejection_text(e))
+        
+        except FileTooLargeError as e:
+            await progress.close()
+            logger.info(f"Rejected {tiktok_url}: {e}")
+            await self.report_too_large(processing_msg, e.size)
                 
         except Exception as e:
+            metrics.record_request('failure', 'error')
             logger.error(f"Error processing request: {e}", exc_info=True)
+            await progress.close()
             await processing_msg.edit_text(
                 f"An error occurred while processing your request.\n\n"
                 f"Error: {str(e)}\n\n"
                 "Please try again later."
             )
-            
-            output_filename = self.extract_filename_from_url(tiktok_url)
-            if os.path.exists(output_filename):
-                os.remove(output_filename)
     
-    def run(self):
-        application = Application.builder().token(self.token).build()
+    async def report_failure(self, processing_msg):
+        metrics.record_request('failure', 'download_failed')
+        await processing_msg.edit_text(
+            "Failed to download the video.\n\n"
+            "Possible reasons:\n"
+            "The video is private\n"
+            "The URL is invalid\n"
+            "The video has been deleted\n"
+            "Network issue\n\n"
+            "Please try again with a different video."
+        )
+    
+    async def report_too_large(self, processing_msg, file_size):
+        metrics.record_request('failure', 'too_large')
+        await processing_msg.edit_text(
+            f"Video is too large ({file_size / (1024 * 1024):.2f} MB)\n"
+            "Telegram bot limit is 50 MB.\n"
+            "Please try a shorter video."
+        )
+    
+    async def deliver_video(self, update, processing_msg, tiktok_url, cache_key, output_filename, success, joined=False):
+        if not (success and os.path.exists(output_filename)):
+            await self.report_failure(processing_msg)
+            return
+        
+        file_size = os.path.getsize(output_filename)
+        file_size_mb = file_size / (1024 * 1024)
+        
+        if self.local_mode:
+            await processing_msg.edit_text(self.local_summary(output_filename, file_size))
+            metrics.record_request('success', 'local')
+            logger.info(f"Local mode: Video saved at {output_filename}")
+            return
+        
+        if file_size > MAX_UPLOAD_SIZE:
+            await self.report_too_large(processing_msg, file_size)
+            return
+        
+        if joined and await self.send_cached_video(update, tiktok_url, cache_key):
+            await processing_msg.delete()
+            return
+        
+        await processing_msg.edit_text("Uploading video to Telegram...")
+        
+        with open(output_filename, 'rb') as video_file, metrics.span('telegram_upload'):
+            caption = f"Downloaded from: {tiktok_url.split('?')[0]}\nSize: {file_size_mb:.2f} MB"
+            message = await update.message.reply_video(
+                video=video_file,
+                caption=caption,
+                supports_streaming=True
+            )
+        
+        metrics.record_bytes('upload', file_size)
+        metrics.record_request('success', 'uploaded')
+        if message.video:
+            await asyncio.to_thread(self.file_id_cache.set, cache_key, message.video.file_id, file_size)
+        
+        await processing_msg.delete()
+        logger.info(f"Successfully sent video: {output_filename}")
+    
+    async def deliver_buffer(self, update, processing_msg, tiktok_url, cache_key, output_filename, buffer, joined=False):
+        if buffer is None:
+            await self.report_failure(processing_msg)
+            return
+        
+        if joined and await self.send_cached_video(update, tiktok_url, cache_key):
+            await processing_msg.delete()
+            return
+        
+        await processing_msg.edit_text("Uploading video to Telegram...")
+        
+        buffer.seek(0)
+        video_bytes = buffer.read()
+        file_size = len(video_bytes)
+        
+        caption = f"Downloaded from: {tiktok_url.split('?')[0]}\nSize: {file_size / (1024 * 1024):.2f} MB"
+        with metrics.span('telegram_upload'):
+            message = await update.message.reply_video(
+                video=video_bytes,
+                filename=os.path.basename(output_filename),
+                caption=caption,
+                supports_streaming=True
+            )
+        
+        metrics.record_bytes('upload', file_size)
+        metrics.record_request('success', 'uploaded')
+        if message.video:
+            await asyncio.to_thread(self.file_id_cache.set, cache_key, message.video.file_id, file_size)
+        
+        await processing_msg.delete()
+        logger.info(f"Successfully streamed video to Telegram: {os.path.basename(output_filename)}")
+    
+    def remove_file(self, path):
+        if os.path.exists(path):
+            os.remove(path)
+            logger.info(f"Cleaned up: {path}")
+    
+    async def shutdown(self, application):
+        await self.providers.aclose()
+        await self.downloader.aclose()
+        self.file_id_cache.close()
+        self.resolver.close()
+        if self.media_store:
+            self.media_store.close()
+    
+    def build_application(self):
+        builder = (
+            Application.builder()
+            .token(self.token)
+            .concurrent_updates(self.concurrent_updates)
+            .post_shutdown(self.shutdown)
+        )
+        if self.api_url:
+            builder = builder.base_url(self.api_url)
+        application = builder.build()
         
         application.add_handler(CommandHandler("start", self.start_command))
         application.add_handler(CommandHandler("help", self.help_command))
         
         application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, self.handle_message))
+        return application
+    
+    def start_metrics(self, port):
+        metrics.setup_tracing()
+        if port:
+            metrics.register_stats('tiktok_scheduler', self.scheduler.metrics)
+            metrics.register_stats('tiktok_file_id_cache', self.file_id_cache.stats)
+            metrics.register_stats('tiktok_video_info_cache', self.downloader.info_cache.stats)
+            if self.media_store:
+                metrics.register_stats('tiktok_media_store', self.media_store.stats)
+            metrics.register_stats('tiktok_provider', self.providers.stats, label='provider')
+            metrics.start_metrics_server(port, self.metrics_addr)
+    
+    def run(self):
+        application = self.build_application()
+        self.start_metrics(self.metrics_port)
         
         logger.info("Bot is starting...")
         print("Bot is running! Press Ctrl+C to stop.")
@@ -232,6 +574,11 @@ def main():
             return
     
     try:
+        if os.getenv('WEBHOOK_URL') or os.getenv('WEBHOOK_ROLE'):
+            from webhook import run_webhook
+            run_webhook(token)
+            return
+        
         bot = TikTokBot(token)
         bot.run()
     except KeyboardInterrupt:
@@ -0,0 +1,55 @@
+from types import SimpleNamespace
+
+import pytest
+
+from telegram_bot import PROCESSING_TEXT, TikTokBot
+
+
+class FakeMessage:
+    def __init__(self):
+        self.edits = []
+
+    async def edit_text(self, text):
+        self.edits.append(text)
+
+
+@pytest.fixture
+def bot(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('FILE_ID_CACHE_PATH', str(tmp_path / 'file_ids.db'))
+    monkeypatch.setenv('SHORT_LINK_CACHE_PATH', str(tmp_path / 'short_links.db'))
+    monkeypatch.setenv('MEDIA_STORE_PATH', str(tmp_path / 'store'))
+    monkeypatch.setenv('MAX_CONCURRENT_DOWNLOADS', '1')
+    monkeypatch.setenv('MAX_DOWNLOADS_PER_USER', '1')
+    return TikTokBot('token')
+
+
+async def test_shown_queue_position_is_replaced_after_job_starts(bot):
+    update = SimpleNamespace(effective_user=SimpleNamespace(id=2))
+    message = FakeMessage()
+    running = bot.scheduler.submit(1)
+    job = bot.scheduler.submit(2)
+    position = job.position
+    assert position == 1
+
+    # The job starts while the queue position reply is still being sent.
+    bot.scheduler.release(running)
+    assert job.position == 0
+
+    async def download():
+        return 'video'
+
+    assert await bot.run_job(update, message, job, download, position) == 'video'
+    assert message.edits == [PROCESSING_TEXT]
+    assert bot.scheduler.running == 0
+
+
+async def test_job_that_never_queued_keeps_the_message(bot):
+    update = SimpleNamespace(effective_user=SimpleNamespace(id=1))
+    message = FakeMessage()
+
+    async def download():
+        return 'video'
+
+    assert await bot.run_job(update, message, None, download) == 'video'
+    assert message.edits == []
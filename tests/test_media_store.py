@@ -0,0 +1,93 @@
+import itertools
+import os
+
+import pytest
+
+import media_store
+from media_store import MediaStore
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    # Strictly increasing timestamps make the least recently used entry unambiguous.
+    clock = itertools.count(1)
+    monkeypatch.setattr(media_store.time, 'time', lambda: float(next(clock)))
+    store = MediaStore(root=str(tmp_path / 'store'), quota=250)
+    yield store
+    store.close()
+
+
+def write(tmp_path, name, content):
+    path = tmp_path / name
+    path.write_bytes(content)
+    return str(path)
+
+
+def test_identical_files_are_hard_linked(tmp_path, store):
+    first = store.put('a', write(tmp_path, 'a.mp4', b'x' * 100))
+    second = store.put('b', write(tmp_path, 'b.mp4', b'x' * 100))
+
+    assert first['digest'] == second['digest']
+    assert os.path.samefile(first['path'], second['path'])
+    assert os.path.samefile(second['path'], store.object_path(second['digest']))
+    assert store.stats()['entries'] == 2
+    assert store.stats()['objects'] == 1
+
+
+def test_quota_counts_shared_objects_once(tmp_path, store):
+    for key in ('a', 'b', 'c'):
+        store.put(key, write(tmp_path, f'{key}.mp4', b'x' * 100))
+    store.put('d', write(tmp_path, 'd.mp4', b'y' * 100))
+
+    # Four entries of 100 bytes, but only two distinct objects: nothing is evicted.
+    assert store.stats()['bytes'] == 200
+    assert [store.get(key) is not None for key in 'abcd'] == [True] * 4
+
+
+def test_eviction_frees_least_recently_used_objects(tmp_path, store):
+    store.put('a', write(tmp_path, 'a.mp4', b'a' * 100))
+    store.put('b', write(tmp_path, 'b.mp4', b'b' * 100))
+    store.get('a')
+    store.put('c', write(tmp_path, 'c.mp4', b'c' * 100))
+
+    assert store.get('b') is None
+    assert not os.path.exists(tmp_path / 'b.mp4')
+    assert store.get('a') is not None and store.get('c') is not None
+    assert store.stats()['bytes'] == 200
+
+
+def test_evicting_one_key_keeps_a_shared_object(tmp_path, store):
+    shared = store.put('a', write(tmp_path, 'a.mp4', b'x' * 100))
+    store.put('b', write(tmp_path, 'b.mp4', b'x' * 100))
+    store.put('c', write(tmp_path, 'c.mp4', b'c' * 100))
+    store.get('c')
+    store.get('b')
+    # 'a' is the oldest, but removing it frees nothing while 'b' shares its object, so 'c' goes too.
+    store.put('d', write(tmp_path, 'd.mp4', b'd' * 100))
+
+    assert store.get('a') is None
+    assert store.get('b') is not None
+    assert os.path.exists(store.object_path(shared['digest']))
+    assert store.get('c') is None
+    assert store.stats()['bytes'] == 200
+
+
+def test_removed_visible_file_is_relinked(tmp_path, store):
+    stored = store.put('a', write(tmp_path, 'a.mp4', b'x' * 100))
+    os.remove(stored['path'])
+
+    found = store.get('a')
+
+    assert found['path'] == stored['path']
+    assert os.path.samefile(found['path'], store.object_path(stored['digest']))
+    relinked = store.get('a', str(tmp_path / 'elsewhere.mp4'))
+    assert relinked['path'] == stored['path']
+
+
+def test_missing_object_is_a_miss(tmp_path, store):
+    stored = store.put('a', write(tmp_path, 'a.mp4', b'x' * 100))
+    os.remove(store.object_path(stored['digest']))
+
+    assert store.get('a') is None
+    assert store.stats()['entries'] == 0
+    assert store.stats()['misses'] == 1
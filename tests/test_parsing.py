@@ -0,0 +1,69 @@
+import glob
+import json
+import os
+
+import pytest
+
+from tiktok_downloader import collect_links_lxml, collect_links_soup, parse_download_variants
+
+FIXTURES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks', 'fixtures', 'ajaxsearch')
+
+
+def load_fixture(path):
+    with open(path, encoding='utf-8') as f:
+        if path.endswith('.json'):
+            return json.load(f).get('data') or '', True
+        return f.read(), False
+
+
+MALFORMED = {
+    'unclosed': '<div><a href="http://x/1">Download HD<p>more',
+    'misnested': '<a href="http://x/1"><b>Download</a> HD</b>',
+    'unquoted': '<a href=http://x/1 class=download>Download</a>',
+    'uppercase': '<A HREF="http://x/1">Download HD</A>',
+    'button_in_anchor': '<a href="http://x/1" class="download">Download <button class="btn-download" data-href="http://x/2">HD</button></a>',
+    'anchor_in_button': '<button class="download"><a href="http://x/1">HD</a></button>',
+    'script_text': '<a href="http://x/1">Download<script>var hd = 1</script><style>.hd {}</style></a>',
+    'entities': '<a href="http://x/1?a=1&amp;b=2">Download &amp; HD</a>',
+    'whitespace': '<a href="http://x/1">\n  Download\n  <span>HD</span>\n</a>',
+    'videos': '<video><div><source src="http://x/v.mp4"></div></video><video src="http://x/w.mp4"></video>',
+    'stray_close': '</html><a href="http://x/1">Download HD</a>',
+    'no_href': '<a href="">Download</a><a>Download</a><a href="/relative">Download</a>',
+}
+
+
+@pytest.mark.parametrize('path', sorted(glob.glob(os.path.join(FIXTURES, '*'))), ids=os.path.basename)
+def test_extractors_agree_on_fixtures(path):
+    html, json_mode = load_fixture(path)
+    if not html:
+        pytest.skip('no HTML in fixture')
+
+    assert collect_links_lxml(html, json_mode) == collect_links_soup(html, json_mode)
+
+
+@pytest.mark.parametrize('json_mode', [False, True])
+@pytest.mark.parametrize('name', sorted(MALFORMED))
+def test_extractors_agree_on_malformed_markup(name, json_mode):
+    html = MALFORMED[name]
+
+    assert collect_links_lxml(html, json_mode) == collect_links_soup(html, json_mode)
+
+
+@pytest.mark.parametrize('json_mode', [False, True])
+def test_nested_anchors_diverge(json_mode):
+    html = '<a href="http://x/1">Download <a href="http://x/2">HD</a></a>'
+    inner = {'url': 'http://x/2', 'text': 'HD', 'priority': 10}
+
+    # lxml closes the outer link where the inner one opens, as browsers do.
+    assert collect_links_lxml(html, json_mode) == [{'url': 'http://x/1', 'text': 'Download', 'priority': 5}, inner]
+    assert collect_links_soup(html, json_mode) == [{'url': 'http://x/1', 'text': 'Download HD', 'priority': 10}, inner]
+
+
+def test_variants_from_html_fixture_are_ranked():
+    html, _ = load_fixture(os.path.join(FIXTURES, 'html_page.html'))
+
+    variants = parse_download_variants(html)
+
+    assert variants
+    assert [variant['priority'] for variant in variants] == sorted((variant['priority'] for variant in variants), reverse=True)
+    assert len({variant['url'] for variant in variants}) == len(variants)
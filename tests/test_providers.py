@@ -0,0 +1,179 @@
+import asyncio
+import time
+
+import pytest
+
+from providers import (
+    CLOSED, HALF_OPEN, OPEN, DownloadProvider, NoDownloadLinkError, ProviderError, ProviderSelector
+)
+
+VARIANTS = [{'url': 'https://cdn.example/video.mp4', 'label': 'hd', 'text': 'Download MP4 HD', 'size': None}]
+
+
+class FakeProvider(DownloadProvider):
+    def __init__(self, name, delay=0.0, error=None, queue_delay=0.0):
+        self.name = name
+        self.delay = delay
+        self.error = error
+        self.queue_delay = queue_delay
+        self.calls = 0
+        self.cancelled = 0
+
+    async def acquire(self):
+        await asyncio.sleep(self.queue_delay)
+
+    async def resolve_variants(self, tiktok_url):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.error is not None:
+            raise self.error
+        return [dict(variant, provider=self.name) for variant in VARIANTS]
+
+
+def resolve(selector, video_id=1):
+    return selector.resolve_variants(f"https://www.tiktok.com/@user/video/{video_id}")
+
+
+async def test_download_provider_is_abstract():
+    with pytest.raises(TypeError):
+        DownloadProvider()
+
+
+async def test_ranks_providers_by_latency():
+    slow, fast = FakeProvider('slow', delay=0.05), FakeProvider('fast', delay=0.0)
+    selector = ProviderSelector([slow, fast], hedge_delay=1.0)
+
+    await resolve(selector)
+    await resolve(selector)
+
+    assert [health.provider.name for health in selector.ranked()] == ['fast', 'slow']
+    assert (await resolve(selector))[0]['provider'] == 'fast'
+
+
+async def test_fails_over_and_opens_circuit_after_threshold():
+    broken = FakeProvider('broken', error=ProviderError('broken: 503'))
+    backup = FakeProvider('backup', delay=0.01)
+    selector = ProviderSelector([broken, backup], hedge_delay=1.0, failure_threshold=2, reset_timeout=60)
+    # Make the backup look slow so the broken provider is tried first until its circuit opens.
+    selector.health[1].latency = 100.0
+
+    for _ in range(3):
+        assert (await resolve(selector))[0]['provider'] == 'backup'
+
+    assert selector.health[0].state == OPEN
+    assert broken.calls == 2
+    assert [health.provider.name for health in selector.ranked()] == ['backup']
+
+
+async def test_all_providers_failing_raises_provider_error():
+    selector = ProviderSelector(
+        [FakeProvider('a', error=ProviderError('a: down')), FakeProvider('b', error=RuntimeError('boom'))],
+        hedge_delay=1.0
+    )
+
+    with pytest.raises(ProviderError) as excinfo:
+        await resolve(selector)
+    assert not isinstance(excinfo.value, NoDownloadLinkError)
+
+
+async def test_half_open_allows_a_single_probe():
+    provider = FakeProvider('flaky', delay=0.05, error=ProviderError('flaky: down'))
+    selector = ProviderSelector([provider], hedge_delay=1.0, failure_threshold=1, reset_timeout=0.05)
+
+    with pytest.raises(ProviderError):
+        await resolve(selector)
+    health = selector.health[0]
+    assert health.state == OPEN
+
+    await asyncio.sleep(0.06)
+    provider.error = None
+
+    first = asyncio.ensure_future(resolve(selector, 1))
+    await asyncio.sleep(0.01)
+    assert health.state == HALF_OPEN and health.probing
+    with pytest.raises(ProviderError):
+        await resolve(selector, 2)
+
+    assert (await first)[0]['provider'] == 'flaky'
+    assert provider.calls == 2
+    assert health.state == CLOSED
+
+
+async def test_failed_probe_reopens_circuit():
+    provider = FakeProvider('flaky', error=ProviderError('flaky: down'))
+    selector = ProviderSelector([provider], hedge_delay=1.0, failure_threshold=3, reset_timeout=0.05)
+    health = selector.health[0]
+
+    for _ in range(3):
+        with pytest.raises(ProviderError):
+            await resolve(selector)
+    assert health.state == OPEN
+
+    await asyncio.sleep(0.06)
+    with pytest.raises(ProviderError):
+        await resolve(selector)
+    assert health.state == OPEN
+    assert not health.probing
+    assert provider.calls == 4
+
+
+async def test_hedges_to_next_provider_when_primary_is_slow():
+    slow, fast = FakeProvider('slow', delay=1.0), FakeProvider('fast', delay=0.01)
+    selector = ProviderSelector([slow, fast], hedge_delay=0.05)
+
+    start = time.monotonic()
+    variants = await resolve(selector)
+    elapsed = time.monotonic() - start
+
+    assert variants[0]['provider'] == 'fast'
+    assert elapsed < 0.5
+    # The selector cancels the losing call; let the cancellation be delivered.
+    await asyncio.sleep(0)
+    assert slow.cancelled == 1
+    # The losing call still records a lower bound on its latency.
+    assert selector.health[0].latency >= 0.05
+    assert selector.health[0].failures == 0
+
+
+async def test_no_hedge_before_hedge_delay():
+    primary, backup = FakeProvider('primary', delay=0.01), FakeProvider('backup')
+    selector = ProviderSelector([primary, backup], hedge_delay=0.5)
+
+    assert (await resolve(selector))[0]['provider'] == 'primary'
+    assert backup.calls == 0
+
+
+async def test_missing_download_link_is_not_a_provider_fault():
+    provider = FakeProvider('empty', error=NoDownloadLinkError('empty: no download link in response'))
+    selector = ProviderSelector([provider], hedge_delay=1.0, failure_threshold=2)
+
+    for _ in range(5):
+        with pytest.raises(NoDownloadLinkError):
+            await resolve(selector)
+
+    health = selector.health[0]
+    assert health.state == CLOSED
+    assert health.failures == 0
+    assert health.error_rate == 0.0
+
+
+async def test_rate_limiter_wait_is_not_latency_and_does_not_hedge():
+    primary = FakeProvider('primary', delay=0.01, queue_delay=0.2)
+    backup = FakeProvider('backup')
+    selector = ProviderSelector([primary, backup], hedge_delay=0.1)
+
+    assert (await resolve(selector))[0]['provider'] == 'primary'
+    assert backup.calls == 0
+    assert selector.health[0].latency < 0.1
+
+
+async def test_no_available_providers():
+    selector = ProviderSelector([FakeProvider('a')], failure_threshold=1, reset_timeout=60)
+    selector.health[0].record_failure(time.monotonic())
+
+    with pytest.raises(ProviderError, match="No healthy download providers"):
+        await resolve(selector)
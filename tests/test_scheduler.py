@@ -0,0 +1,153 @@
+import asyncio
+
+import pytest
+
+from scheduler import JobScheduler, QueueFullError, RateLimitedError
+
+
+def make_scheduler(**kwargs):
+    options = {'max_concurrent': 1, 'max_per_user': 1, 'max_queue': 100, 'user_rate': 0}
+    options.update(kwargs)
+    return JobScheduler(**options)
+
+
+async def test_starts_jobs_up_to_max_concurrent():
+    scheduler = make_scheduler(max_concurrent=2, max_per_user=2)
+    jobs = [scheduler.submit(user) for user in ('a', 'b', 'c')]
+
+    assert [job.ready.done() for job in jobs] == [True, True, False]
+    assert scheduler.running == 2
+    assert scheduler.queued() == 1
+
+
+async def test_positions_are_round_robin_across_users():
+    scheduler = make_scheduler()
+    scheduler.submit('busy')
+    a1, a2, a3 = (scheduler.submit('a') for _ in range(3))
+    b1 = scheduler.submit('b')
+    c1, c2 = scheduler.submit('c'), scheduler.submit('c')
+
+    # Each user's first job comes before anyone's second one.
+    assert [job.position for job in (a1, b1, c1, a2, c2, a3)] == [1, 2, 3, 4, 5, 6]
+
+
+async def test_dispatch_follows_round_robin_order():
+    scheduler = make_scheduler()
+    current = scheduler.submit('busy')
+    jobs = {name: scheduler.submit(name[0]) for name in ('a1', 'a2', 'b1', 'c1')}
+
+    order = []
+    for _ in jobs:
+        scheduler.release(current)
+        name, current = next((name, job) for name, job in jobs.items() if job.ready.done() and name not in order)
+        order.append(name)
+
+    assert order == ['a1', 'b1', 'c1', 'a2']
+
+
+async def test_position_drops_to_zero_once_started():
+    scheduler = make_scheduler()
+    running = scheduler.submit('a')
+    queued = scheduler.submit('b')
+    assert queued.position == 1
+
+    scheduler.release(running)
+    # Callers that showed a queue position must remember it: the job no longer reports one.
+    assert queued.position == 0
+
+
+async def test_per_user_limit_lets_other_users_through():
+    scheduler = make_scheduler(max_concurrent=3, max_per_user=1)
+    first = scheduler.submit('a')
+    second = scheduler.submit('a')
+    other = scheduler.submit('b')
+
+    assert (first.ready.done(), second.ready.done(), other.ready.done()) == (True, False, True)
+    scheduler.release(first)
+    assert second.ready.done()
+
+
+async def test_release_of_queued_job_removes_it():
+    scheduler = make_scheduler()
+    running = scheduler.submit('a')
+    queued = scheduler.submit('b')
+    behind = scheduler.submit('c')
+    assert behind.position == 2
+
+    scheduler.release(queued)
+    assert (queued.position, behind.position, scheduler.queued()) == (0, 1, 1)
+
+    scheduler.release(running)
+    assert behind.ready.done()
+    assert scheduler.running == 1
+    assert scheduler.metrics()['completed'] == 1
+
+
+async def test_release_is_idempotent():
+    scheduler = make_scheduler(max_concurrent=2, max_per_user=2)
+    job = scheduler.submit('a')
+    scheduler.release(job)
+    scheduler.release(job)
+
+    assert scheduler.running == 0
+    assert scheduler.metrics()['completed'] == 1
+    assert scheduler.active == {}
+
+
+async def test_context_manager_waits_for_slot_and_releases():
+    scheduler = make_scheduler()
+    order = []
+
+    async def work(name):
+        async with scheduler.submit(name):
+            order.append(f"{name} start")
+            await asyncio.sleep(0.01)
+            order.append(f"{name} end")
+
+    await asyncio.gather(work('a'), work('b'))
+
+    assert order == ['a start', 'a end', 'b start', 'b end']
+    assert scheduler.running == 0
+
+
+async def test_cancelled_waiter_leaves_the_queue():
+    scheduler = make_scheduler()
+    running = scheduler.submit('a')
+    queued = scheduler.submit('b')
+
+    async def wait():
+        async with queued:
+            pass
+
+    task = asyncio.ensure_future(wait())
+    await asyncio.sleep(0)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    scheduler.release(running)
+
+    assert scheduler.queued() == 0
+    assert scheduler.running == 0
+
+
+async def test_rejects_when_queue_is_full():
+    scheduler = make_scheduler(max_queue=2)
+    for user in ('a', 'b', 'c'):
+        scheduler.submit(user)
+
+    with pytest.raises(QueueFullError):
+        scheduler.submit('d')
+    assert scheduler.metrics()['rejected_queue_full'] == 1
+
+
+async def test_rate_limits_each_user():
+    scheduler = make_scheduler(max_concurrent=10, max_per_user=10, user_rate=1 / 60, user_burst=2)
+    scheduler.submit('a')
+    scheduler.submit('a')
+
+    with pytest.raises(RateLimitedError) as excinfo:
+        scheduler.submit('a')
+    scheduler.submit('b')
+
+    assert 0 < excinfo.value.retry_after <= 60
+    assert scheduler.metrics()['rejected_rate_limited'] == 1
@@ -0,0 +1,160 @@
+import asyncio
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+async def test_concurrent_callers_share_one_call():
+    group = SingleFlight()
+    calls = 0
+
+    async def factory():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return 'video'
+
+    async def request():
+        flight = group.join('key', factory)
+        async with flight as result:
+            return result, flight.leader
+
+    results = await asyncio.gather(*(request() for _ in range(5)))
+
+    assert calls == 1
+    assert [result for result, _ in results] == ['video'] * 5
+    assert sum(leader for _, leader in results) == 1
+    assert len(group) == 0
+
+
+async def test_waiters_counts_joined_callers():
+    group = SingleFlight()
+    release = asyncio.Event()
+
+    async def factory():
+        await release.wait()
+        return 'video'
+
+    async def request():
+        async with group.join('key', factory) as result:
+            return result
+
+    tasks = [asyncio.ensure_future(request()) for _ in range(3)]
+    await asyncio.sleep(0)
+    assert group.waiters('key') == 3
+
+    release.set()
+    await asyncio.gather(*tasks)
+    assert group.waiters('key') == 0
+
+
+async def test_cleanup_runs_once_after_last_waiter_leaves():
+    group = SingleFlight()
+    cleaned = []
+    first_done = asyncio.Event()
+
+    async def factory():
+        await asyncio.sleep(0.01)
+        return 'buffer'
+
+    async def request(hold):
+        async with group.join('key', factory, cleanup=cleaned.append) as result:
+            if hold:
+                await first_done.wait()
+                # The other waiter has left, but this one still uses the result.
+                assert cleaned == []
+            else:
+                first_done.set()
+            return result
+
+    await asyncio.gather(request(True), request(False))
+
+    assert cleaned == ['buffer']
+    assert len(group) == 0
+
+
+async def test_failure_propagates_to_all_waiters_and_cleans_up():
+    group = SingleFlight()
+    cleaned = []
+
+    async def factory():
+        await asyncio.sleep(0.01)
+        raise RuntimeError('download failed')
+
+    async def request():
+        async with group.join('key', factory, cleanup=cleaned.append):
+            pass
+
+    results = await asyncio.gather(request(), request(), return_exceptions=True)
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert cleaned == [None]
+    assert len(group) == 0
+
+
+async def test_call_survives_while_any_waiter_remains():
+    group = SingleFlight()
+    started = asyncio.Event()
+
+    async def factory():
+        started.set()
+        await asyncio.sleep(0.05)
+        return 'video'
+
+    async def request():
+        async with group.join('key', factory) as result:
+            return result
+
+    leader = asyncio.ensure_future(request())
+    await started.wait()
+    follower = asyncio.ensure_future(request())
+    await asyncio.sleep(0)
+    leader.cancel()
+
+    assert await follower == 'video'
+    assert leader.cancelled()
+
+
+async def test_last_waiter_cancelling_cancels_the_call():
+    group = SingleFlight()
+    cancelled = asyncio.Event()
+    cleaned = []
+
+    async def factory():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    async def request():
+        async with group.join('key', factory, cleanup=cleaned.append):
+            pass
+
+    task = asyncio.ensure_future(request())
+    await asyncio.sleep(0.01)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    await asyncio.wait_for(cancelled.wait(), 1)
+
+    assert cleaned == [None]
+    assert len(group) == 0
+
+
+async def test_new_call_after_previous_finished():
+    group = SingleFlight()
+    calls = 0
+
+    async def factory():
+        nonlocal calls
+        calls += 1
+        return calls
+
+    async with group.join('key', factory) as first:
+        pass
+    async with group.join('key', factory) as second:
+        pass
+
+    assert (first, second) == (1, 2)
@@ -0,0 +1,71 @@
+import httpx
+import pytest
+
+from tiktok_downloader import AsyncTikTokDownloader, FileTooLargeError, make_video_info
+from video_info import VideoInfoCache
+
+TIKTOK_URL = "https://www.tiktok.com/@user/video/1234567890"
+VARIANTS = {
+    'hd': ('https://cdn.example/hd.mp4', 2000),
+    'no_watermark': ('https://cdn.example/sd.mp4', 500),
+    'audio': ('https://cdn.example/audio.mp3', 100),
+}
+
+
+def make_downloader():
+    requests = []
+
+    def handler(request):
+        requests.append((request.method, str(request.url)))
+        size = next(size for url, size in VARIANTS.values() if url == str(request.url))
+        return httpx.Response(200, content=b'x' * size)
+
+    downloader = AsyncTikTokDownloader(
+        client=httpx.AsyncClient(transport=httpx.MockTransport(handler)), info_cache=VideoInfoCache()
+    )
+    variants = [{'url': url, 'label': label, 'text': label, 'size': None} for label, (url, _) in VARIANTS.items()]
+    downloader.info_cache.set('1234567890', make_video_info(TIKTOK_URL, variants))
+    return downloader, requests
+
+
+async def test_downloads_best_variant_without_probing():
+    downloader, requests = make_downloader()
+
+    buffer = await downloader.stream_tiktok_hd(TIKTOK_URL, max_size=5000)
+
+    assert len(buffer.read()) == 2000
+    assert requests == [('GET', 'https://cdn.example/hd.mp4')]
+
+
+async def test_falls_back_to_smaller_variant_when_too_large():
+    downloader, requests = make_downloader()
+
+    buffer = await downloader.stream_tiktok_hd(TIKTOK_URL, max_size=1000)
+
+    assert len(buffer.read()) == 500
+    assert [url for _, url in requests] == ['https://cdn.example/hd.mp4', 'https://cdn.example/sd.mp4']
+    # The next request for the same video skips the variant already known to be too large.
+    requests.clear()
+    await downloader.stream_tiktok_hd(TIKTOK_URL, max_size=1000)
+    assert [url for _, url in requests] == ['https://cdn.example/sd.mp4']
+
+
+async def test_too_large_when_no_video_variant_fits(tmp_path):
+    downloader, requests = make_downloader()
+
+    with pytest.raises(FileTooLargeError) as excinfo:
+        await downloader.download_tiktok_hd(TIKTOK_URL, str(tmp_path / 'video.mp4'), max_size=400)
+
+    assert excinfo.value.size == 500
+    # The audio variant is never fetched or probed.
+    assert 'https://cdn.example/audio.mp3' not in [url for _, url in requests]
+    assert list(tmp_path.iterdir()) == []
+
+
+async def test_probes_only_video_variants():
+    downloader, requests = make_downloader()
+
+    info = await downloader.get_video_info(TIKTOK_URL)
+
+    assert [variant['size'] for variant in info.variants] == [2000, 500, None]
+    assert sorted(url for _, url in requests) == ['https://cdn.example/hd.mp4', 'https://cdn.example/sd.mp4']
@@ -0,0 +1,94 @@
+import pytest
+
+import video_cache
+from video_cache import FileIdCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        self.now += 1
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(video_cache.time, 'time', clock)
+    return clock
+
+
+def make_cache(tmp_path, **kwargs):
+    return FileIdCache(path=str(tmp_path / 'cache' / 'file_ids.db'), **kwargs)
+
+
+def test_set_and_get(tmp_path, clock):
+    cache = make_cache(tmp_path)
+    cache.set('video', 'file-1', 1234)
+
+    assert cache.get('video') == {'file_id': 'file-1', 'file_size': 1234}
+    assert cache.get('other') is None
+
+
+def test_entries_expire_after_ttl(tmp_path, clock):
+    cache = make_cache(tmp_path, ttl=60)
+    cache.set('video', 'file-1')
+    assert cache.get('video') is not None
+
+    clock.now += 60
+    assert cache.get('video') is None
+    assert cache.stats()['entries'] == 0
+
+
+def test_set_drops_expired_entries(tmp_path, clock):
+    cache = make_cache(tmp_path, ttl=60)
+    cache.set('old', 'file-1')
+    clock.now += 60
+    cache.set('new', 'file-2')
+
+    assert cache.stats()['entries'] == 1
+
+
+def test_evicts_least_recently_used_beyond_max_entries(tmp_path, clock):
+    cache = make_cache(tmp_path, max_entries=2)
+    cache.set('a', 'file-a')
+    cache.set('b', 'file-b')
+    cache.get('a')
+    cache.set('c', 'file-c')
+
+    assert cache.stats()['entries'] == 2
+    assert cache.get('b') is None
+    assert cache.get('a') is not None
+    assert cache.get('c') is not None
+
+
+def test_zero_limits_keep_everything(tmp_path, clock):
+    cache = make_cache(tmp_path, ttl=0, max_entries=0)
+    for i in range(5):
+        cache.set(str(i), f'file-{i}')
+    clock.now += 10 ** 9
+
+    assert cache.get('0') is not None
+    assert cache.stats()['entries'] == 5
+
+
+def test_counts_hits_and_misses(tmp_path, clock):
+    cache = make_cache(tmp_path)
+    cache.set('video', 'file-1')
+    cache.get('video')
+    cache.get('video')
+    cache.get('missing')
+
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (2, 1, 1)
+    assert stats['hit_rate'] == pytest.approx(2 / 3)
+
+
+def test_persists_across_instances(tmp_path, clock):
+    cache = make_cache(tmp_path)
+    cache.set('video', 'file-1')
+    cache.close()
+
+    assert make_cache(tmp_path).get('video') == {'file_id': 'file-1', 'file_size': None}
@@ -0,0 +1,76 @@
+import http.client
+import threading
+
+import pytest
+
+from webhook import MAX_UPDATE_SIZE, SECRET_HEADER, WebhookServer
+
+
+class ListQueue:
+    def __init__(self, accept=True):
+        self.items = []
+        self.accept = accept
+
+    def put(self, payload):
+        if self.accept:
+            self.items.append(payload)
+        return self.accept
+
+
+@pytest.fixture(scope='module')
+def server():
+    server = WebhookServer(('127.0.0.1', 0), None, secret='secret')
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def updates(server):
+    server.updates = ListQueue()
+    return server.updates
+
+
+def post(server, body=b'{}', length=None, secret='secret', path='/webhook'):
+    conn = http.client.HTTPConnection(*server.server_address, timeout=5)
+    try:
+        conn.putrequest('POST', path)
+        conn.putheader('Content-Length', str(len(body)) if length is None else length)
+        if secret is not None:
+            conn.putheader(SECRET_HEADER, secret)
+        conn.endheaders()
+        conn.send(body)
+        return conn.getresponse().status
+    finally:
+        conn.close()
+
+
+def test_accepts_update(server, updates):
+    assert post(server, b'{"update_id": 1}') == 200
+    assert updates.items == [b'{"update_id": 1}']
+
+
+def test_rejects_wrong_path_and_secret(server, updates):
+    assert post(server, path='/other') == 404
+    assert post(server, secret='wrong') == 403
+    assert post(server, secret=None) == 403
+    assert updates.items == []
+
+
+@pytest.mark.parametrize('length, status', [
+    ('abc', 400),
+    ('', 400),
+    ('0', 400),
+    ('-5', 400),
+    (str(MAX_UPDATE_SIZE + 1), 413),
+])
+def test_rejects_bad_content_length(server, updates, length, status):
+    assert post(server, b'', length=length) == status
+    assert updates.items == []
+
+
+def test_full_queue_asks_telegram_to_retry(server, updates):
+    updates.accept = False
+    assert post(server) == 503
@@ -1,26 +1,388 @@
 #!/usr/bin/env python3
 
 import requests
+import httpx
+from requests.adapters import HTTPAdapter
+from rate_limit import HostRateLimiter
+from progress import ProgressThrottle, print_progress
+from video_info import VideoInfo, VideoInfoCache, classify_link
+from link_resolver import parse_video_url
+import metrics
 from bs4 import BeautifulSoup
+import asyncio
+import importlib.util
+import random
 import re
 import time
 import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urljoin
 
 
+BASE_URL = "https://tikdownloader.io"
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+MIN_SEGMENT_SIZE = 1024 * 1024
+DEFAULT_SCRAPE_RATE = 2.0
+DEFAULT_SCRAPE_BURST = 5
+
+# httpx only negotiates HTTP/2 when the optional h2 package is installed.
+HTTP2_AVAILABLE = importlib.util.find_spec('h2') is not None
+
+BROWSER_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.5',
+    'Accept-Encoding': 'gzip, deflate, br',
+    'DNT': '1',
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1'
+}
+
+
+RETRY_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504}
+
+
+class RetryableError(Exception):
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def parse_retry_after(value):
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt, base=0.5, cap=30.0, retry_after=None):
+    if retry_after is not None:
+        return min(cap, retry_after)
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def check_retryable_status(response):
+    if response.status_code in RETRY_STATUS_CODES:
+        raise RetryableError(
+            f"Received status code {response.status_code}",
+            parse_retry_after(response.headers.get('retry-after'))
+        )
+
+
+def range_total(headers):
+    content_range = headers.get('content-range', '')
+    total = content_range.rpartition('/')[2]
+    return int(total) if total.isdigit() else None
+
+
+def expected_size(status_code, headers, offset):
+    if status_code == 206:
+        return range_total(headers)
+    length = int(headers.get('content-length', 0))
+    return offset + length if length else None
+
+
+def make_part_file(output_filename):
+    # Unique per download, so processes fetching the same video never write to one partial file.
+    directory, name = os.path.split(output_filename)
+    fd, part_filename = tempfile.mkstemp(prefix=f"{name}.", suffix='.part', dir=directory or None)
+    os.fchmod(fd, 0o644)
+    os.close(fd)
+    return part_filename
+
+
+class FileTooLargeError(Exception):
+    def __init__(self, size, max_size):
+        super().__init__(f"Video is {size / 1024 / 1024:.2f} MB, limit is {max_size / 1024 / 1024:.2f} MB")
+        self.size = size
+        self.max_size = max_size
+
+
+JSON_LINK_KEYWORDS = ['hd', 'download', 'mp4', 'without watermark', 'no watermark']
+HTML_LINK_KEYWORDS = ['hd', 'download', 'mp4', 'without watermark']
+DOWNLOAD_CLASS_RE = re.compile(r'download|btn-download', re.I)
+SKIPPED_TEXT_TAGS = ('script', 'style', 'template')
+
+try:
+    import lxml.html
+    from lxml.etree import ParserError
+except ImportError:
+    lxml = None
+
+
+def keyword_link(href, text, keywords):
+    lowered = text.lower()
+    if href.startswith('http') and any(keyword in lowered for keyword in keywords):
+        return {
+            'url': href,
+            'text': text,
+            'priority': 10 if 'hd' in lowered else 5
+        }
+    return None
+
+
+def collect_links_soup(html, json_mode=False):
+    soup = BeautifulSoup(html, 'html.parser')
+    keywords = JSON_LINK_KEYWORDS if json_mode else HTML_LINK_KEYWORDS
+    
+    download_links = []
+    
+    for link in soup.find_all('a', href=True):
+        candidate = keyword_link(link['href'], link.get_text().strip(), keywords)
+        if candidate:
+            download_links.append(candidate)
+    
+    if json_mode:
+        return download_links
+    
+    download_buttons = soup.find_all(['a', 'button'], class_=DOWNLOAD_CLASS_RE)
+    for btn in download_buttons:
+        href = btn.get('href') or btn.get('data-href')
+        if href and href.startswith('http'):
+            download_links.append({
+                'url': href,
+                'text': btn.get_text().strip(),
+                'priority': 8
+            })
+    
+    video_tags = soup.find_all('video')
+    for video in video_tags:
+        source = video.get('src') or (video.find('source') and video.find('source').get('src'))
+        if source and source.startswith('http'):
+            download_links.append({
+                'url': source,
+                'text': 'Direct Video Link',
+                'priority': 7
+            })
+    
+    return download_links
+
+
+def element_text(element):
+    if not len(element):
+        return element.text or ''
+    
+    parts = [element.text or '']
+    for child in element:
+        if isinstance(child.tag, str) and child.tag not in SKIPPED_TEXT_TAGS:
+            parts.append(element_text(child))
+        if child.tail:
+            parts.append(child.tail)
+    return ''.join(parts)
+
+
+def collect_links_lxml(html, json_mode=False):
+    root = lxml.html.document_fromstring(html)
+    keywords = JSON_LINK_KEYWORDS if json_mode else HTML_LINK_KEYWORDS
+    
+    # Single pass over the tree, bucketed so the result matches the
+    # order of the three find_all passes in collect_links_soup.
+    # The two differ on nested anchors: lxml closes the outer <a> when the
+    # inner one opens, as browsers do, so `<a>Download <a>HD</a></a>` gives
+    # the outer link the text "Download" (priority 5) where html.parser
+    # keeps "Download HD" (priority 10).
+    anchors, buttons, videos = [], [], []
+    
+    tags = ('a',) if json_mode else ('a', 'button', 'video')
+    for element in root.iter(*tags):
+        tag = element.tag
+        
+        if tag == 'video':
+            source = element.get('src')
+            if not source:
+                source_tag = element.find('.//source')
+                source = source_tag.get('src') if source_tag is not None else None
+            if source and source.startswith('http'):
+                videos.append({
+                    'url': source,
+                    'text': 'Direct Video Link',
+                    'priority': 7
+                })
+            continue
+        
+        text = None
+        href = element.get('href')
+        
+        if tag == 'a' and href is not None:
+            text = element_text(element).strip()
+            candidate = keyword_link(href, text, keywords)
+            if candidate:
+                anchors.append(candidate)
+        
+        if json_mode:
+            continue
+        
+        class_name = element.get('class')
+        if class_name and DOWNLOAD_CLASS_RE.search(class_name):
+            href = href or element.get('data-href')
+            if href and href.startswith('http'):
+                buttons.append({
+                    'url': href,
+                    'text': text if text is not None else element_text(element).strip(),
+                    'priority': 8
+                })
+    
+    return anchors + buttons + videos
+
+
+def collect_download_links(html, json_mode=False):
+    if lxml is not None and html:
+        try:
+            return collect_links_lxml(html, json_mode)
+        except (ParserError, ValueError):
+            pass
+    return collect_links_soup(html, json_mode)
+
+
+def parse_download_variants(response_data):
+    try:
+        if isinstance(response_data, dict):
+            print("[*] Parsing JSON response")
+            
+            if response_data.get('status') == 'error':
+                error_msg = response_data.get('mess', 'Unknown error')
+                print(f"[!] API Error: {error_msg}")
+                return []
+            
+            download_links = []
+            
+            if 'data' in response_data:
+                download_links.extend(collect_download_links(response_data['data'], json_mode=True))
+            
+            possible_keys = ['url', 'video_url', 'download_url', 'hd_url', 'hdplay']
+            for key in possible_keys:
+                if key in response_data and response_data[key]:
+                    download_links.append({
+                        'url': response_data[key],
+                        'text': f'Direct link ({key})',
+                        'priority': 9
+                    })
+            
+            if not download_links:
+                print("[!] No download links found in JSON response")
+                print(f"[*] Response keys: {list(response_data.keys())}")
+                return []
+        
+        else:
+            print("[*] Parsing HTML response")
+            download_links = collect_download_links(response_data)
+            
+            if not download_links:
+                print("[!] No download links found in the response")
+                print("[*] Response HTML (first 500 chars):")
+                print(str(response_data)[:500])
+                return []
+        
+        download_links.sort(key=lambda x: x['priority'], reverse=True)
+        
+        variants = []
+        seen = set()
+        for link in download_links:
+            if link['url'] in seen:
+                continue
+            seen.add(link['url'])
+            variants.append({**link, 'label': classify_link(link['text']), 'size': None})
+        
+        print(f"[*] Found {len(variants)} download options")
+        for i, variant in enumerate(variants[:3], 1):
+            url_preview = variant['url'][:60] + '...' if len(variant['url']) > 60 else variant['url']
+            print(f"    {i}. {variant['text']} [{variant['label']}] - {url_preview}")
+        return variants
+            
+    except Exception as e:
+        print(f"[!] Error extracting download link: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return []
+
+
+def video_info_key(tiktok_url):
+    parsed = parse_video_url(tiktok_url)
+    return parsed[1] if parsed else tiktok_url.split('?')[0]
+
+
+def make_video_info(tiktok_url, variants):
+    parsed = parse_video_url(tiktok_url)
+    creator, video_id = parsed if parsed else (None, None)
+    return VideoInfo(tiktok_url, video_id, creator, variants)
+
+
+def parse_hd_download_link(response_data):
+    variants = parse_download_variants(response_data)
+    if not variants:
+        return None
+    
+    best = VideoInfo(None, variants=variants).best_variant()
+    return (best or variants[0])['url']
+
+
 class TikTokDownloader:
-    def __init__(self):
-        self.base_url = "https://tikdownloader.io"
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-            'Accept-Language': 'en-US,en;q=0.5',
-            'Accept-Encoding': 'gzip, deflate, br',
-            'DNT': '1',
-            'Connection': 'keep-alive',
-            'Upgrade-Insecure-Requests': '1'
-        })
+    RETRY_EXCEPTIONS = (
+        RetryableError,
+        requests.ConnectionError,
+        requests.Timeout,
+        requests.exceptions.ChunkedEncodingError
+    )
+
+    def __init__(self, base_url=BASE_URL, chunk_size=DEFAULT_CHUNK_SIZE, connect_timeout=10, read_timeout=30,
+                 max_retries=3, backoff_base=0.5, backoff_cap=30.0, segments=1, rate_limiter=None,
+                 progress_interval=0.5, progress_step=1.0, pool_connections=10, scraper_pool_size=10,
+                 cdn_pool_size=None, pool_block=False, keep_alive=True, info_cache=None):
+        self.base_url = base_url
+        self.info_cache = info_cache or VideoInfoCache()
+        self.progress_interval = progress_interval
+        self.progress_step = progress_step
+        self.rate_limiter = rate_limiter or HostRateLimiter(DEFAULT_SCRAPE_RATE, DEFAULT_SCRAPE_BURST)
+        self.chunk_size = chunk_size
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.segments = segments if hasattr(os, 'pwrite') else 1
+        self.keep_alive = keep_alive
+        
+        # urllib3 pools are thread-safe, Sessions are not: every thread gets its own Session
+        # mounting the same two adapters, so ajaxSearch calls and CDN downloads never
+        # compete for connections.
+        self.scraper_adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=scraper_pool_size, pool_block=pool_block
+        )
+        self.cdn_adapter = HTTPAdapter(
+            pool_connections=pool_connections, pool_maxsize=cdn_pool_size or max(10, self.segments),
+            pool_block=pool_block
+        )
+        self.local = threading.local()
+
+    @property
+    def session(self):
+        session = getattr(self.local, 'session', None)
+        if session is None:
+            session = self.local.session = requests.Session()
+            session.headers.update(BROWSER_HEADERS)
+            if not self.keep_alive:
+                session.headers['Connection'] = 'close'
+            session.mount('https://', self.cdn_adapter)
+            session.mount('http://', self.cdn_adapter)
+            session.mount(self.base_url, self.scraper_adapter)
+        return session
+
+    def close(self):
+        self.scraper_adapter.close()
+        self.cdn_adapter.close()
+
+    def call_with_retries(self, func, description):
+        for attempt in range(self.max_retries + 1):
+            try:
+                return func()
+            except self.RETRY_EXCEPTIONS as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = backoff_delay(attempt, self.backoff_base, self.backoff_cap, getattr(e, 'retry_after', None))
+                print(f"[*] {description} failed ({str(e)}), retrying in {delay:.1f}s")
+                time.sleep(delay)
 
     def get_download_page(self, tiktok_url):
         try:
@@ -28,12 +390,12 @@ class TikTokDownloader:
             
             api_url = f"{self.base_url}/api/ajaxSearch"
             
-            self.session.headers.update({
+            headers = {
                 'Content-Type': 'application/x-www-form-urlencoded; charset=UTF-8',
                 'Origin': self.base_url,
                 'Referer': f'{self.base_url}/en',
                 'X-Requested-With': 'XMLHttpRequest'
-            })
+            }
             
             payload = {
                 'q': tiktok_url,
@@ -41,7 +403,16 @@ class TikTokDownloader:
             }
             
             print(f"[*] Sending POST request to API: {api_url}")
-            response = self.session.post(api_url, data=payload)
+            
+            def post():
+                # Time only the request itself, not the wait for a rate limiter token.
+                self.rate_limiter.acquire(api_url)
+                with metrics.span('ajax_search', provider=self.base_url):
+                    response = self.session.post(api_url, data=payload, headers=headers, timeout=self.timeout)
+                check_retryable_status(response)
+                return response
+            
+            response = self.call_with_retries(post, "ajaxSearch request")
             
             if response.status_code == 200:
                 try:
@@ -63,146 +434,203 @@ class TikTokDownloader:
             return None
 
     def extract_hd_download_link(self, response_data):
-        try:
-            if isinstance(response_data, dict):
-                print("[*] Parsing JSON response")
-                
-                if response_data.get('status') == 'error':
-                    error_msg = response_data.get('mess', 'Unknown error')
-                    print(f"[!] API Error: {error_msg}")
-                    return None
-                
-                download_links = []
-                
-                if 'data' in response_data:
-                    html_content = response_data['data']
-                    soup = BeautifulSoup(html_content, 'html.parser')
-                    
-                    for link in soup.find_all('a', href=True):
-                        href = link['href']
-                        text = link.get_text().strip()
-                        
-                        if href.startswith('http') and any(keyword in text.lower() for keyword in ['hd', 'download', 'mp4', 'without watermark', 'no watermark']):
-                            priority = 10 if 'hd' in text.lower() else 5
-                            download_links.append({
-                                'url': href,
-                                'text': text,
-                                'priority': priority
-                            })
-                
-                possible_keys = ['url', 'video_url', 'download_url', 'hd_url', 'hdplay']
-                for key in possible_keys:
-                    if key in response_data and response_data[key]:
-                        download_links.append({
-                            'url': response_data[key],
-                            'text': f'Direct link ({key})',
-                            'priority': 9
-                        })
-                
-                if download_links:
-                    download_links.sort(key=lambda x: x['priority'], reverse=True)
-                    print(f"[*] Found {len(download_links)} download options")
-                    for i, link in enumerate(download_links[:3], 1):
-                        url_preview = link['url'][:60] + '...' if len(link['url']) > 60 else link['url']
-                        print(f"    {i}. {link['text']} - {url_preview}")
-                    return download_links[0]['url']
-                else:
-                    print("[!] No download links found in JSON response")
-                    print(f"[*] Response keys: {list(response_data.keys())}")
-                    return None
+        with metrics.span('parse'):
+            return parse_hd_download_link(response_data)
+
+    def extract_download_variants(self, response_data):
+        with metrics.span('parse'):
+            return parse_download_variants(response_data)
+
+    def get_video_info(self, tiktok_url, probe_sizes=True):
+        key = video_info_key(tiktok_url)
+        info = self.info_cache.get(key)
+        if info is None:
+            response_data = self.get_download_page(tiktok_url)
+            variants = self.extract_download_variants(response_data) if response_data else []
+            if not variants:
+                return None
+            info = make_video_info(tiktok_url, variants)
+            self.info_cache.set(key, info)
+        
+        if probe_sizes and not info.sized:
+            for variant in info.videos():
+                try:
+                    variant['size'] = self.probe_variant_size(variant['url'])
+                except requests.RequestException as e:
+                    print(f"[!] Could not get size of {variant['label']} variant: {str(e)}")
+            info.sized = True
+        return info
+
+    def fetch_into(self, download_url, f, progress=None):
+        offset = f.tell()
+        headers = {'Accept-Encoding': 'identity'}
+        if offset:
+            headers['Range'] = f'bytes={offset}-'
+        
+        start = time.monotonic()
+        with self.session.get(download_url, stream=True, timeout=self.timeout, headers=headers) as response:
+            metrics.observe('cdn_ttfb', time.monotonic() - start)
+            if response.status_code == 416 and offset:
+                if range_total(response.headers) == offset:
+                    return True
+                f.seek(0)
+                f.truncate()
+                raise RetryableError("Partial download no longer matches the remote file")
+            
+            check_retryable_status(response)
+            
+            if response.status_code not in (200, 206):
+                print(f"[!] Failed to download video. Status code: {response.status_code}")
+                return False
+            
+            if response.status_code == 200 and offset:
+                f.seek(0)
+                f.truncate()
+                offset = 0
+            elif offset:
+                print(f"[*] Resuming download at {offset / 1024 / 1024:.2f} MB")
+            
+            total_size = expected_size(response.status_code, response.headers, offset)
+            
+            downloaded = offset
+            for chunk in response.iter_content(chunk_size=self.chunk_size):
+                if chunk:
+                    f.write(chunk)
+                    downloaded += len(chunk)
+                    if progress:
+                        progress.update(downloaded, total_size)
+            
+            metrics.record_download(downloaded - offset, time.monotonic() - start)
+            if total_size and downloaded < total_size:
+                raise RetryableError(f"Connection closed after {downloaded} of {total_size} bytes")
+        
+        return True
+
+    def probe_variant_size(self, download_url):
+        response = self.session.head(
+            download_url, headers={'Accept-Encoding': 'identity'}, timeout=self.timeout, allow_redirects=True
+        )
+        length = response.headers.get('Content-Length')
+        if response.status_code == 200 and length and length.isdigit():
+            return int(length)
+        return self.probe_size(download_url)
+
+    def probe_size(self, download_url):
+        headers = {'Accept-Encoding': 'identity', 'Range': 'bytes=0-0'}
+        with self.session.get(download_url, stream=True, timeout=self.timeout, headers=headers) as response:
+            if response.status_code != 206:
+                return None
+            return range_total(response.headers)
+
+    def fetch_range(self, download_url, fd, segment, progress):
+        start, end = segment
+        headers = {'Accept-Encoding': 'identity', 'Range': f'bytes={start}-{end}'}
+        
+        with self.session.get(download_url, stream=True, timeout=self.timeout, headers=headers) as response:
+            check_retryable_status(response)
+            
+            if response.status_code != 206:
+                print(f"[!] Failed to download segment {start}-{end}. Status code: {response.status_code}")
+                return False
+            
+            for chunk in response.iter_content(chunk_size=self.chunk_size):
+                if chunk:
+                    os.pwrite(fd, chunk, segment[0])
+                    segment[0] += len(chunk)
+                    progress(len(chunk))
             
+            if segment[0] <= end:
+                raise RetryableError(f"Segment {start}-{end} closed at byte {segment[0]}")
+        
+        return True
+
+    def download_segmented(self, download_url, part_filename, total_size, segments, progress=None):
+        segment_size = -(-total_size // segments)
+        ranges = [
+            [start, min(start + segment_size, total_size) - 1]
+            for start in range(0, total_size, segment_size)
+        ]
+        print(f"[*] Downloading in {len(ranges)} segments of {segment_size / 1024 / 1024:.2f} MB")
+        
+        lock = threading.Lock()
+        downloaded = [0]
+        
+        def advance(size):
+            with lock:
+                downloaded[0] += size
+                if progress:
+                    progress.update(downloaded[0], total_size)
+        
+        fd = os.open(part_filename, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            if hasattr(os, 'posix_fallocate'):
+                os.posix_fallocate(fd, 0, total_size)
             else:
-                print("[*] Parsing HTML response")
-                soup = BeautifulSoup(response_data, 'html.parser')
-                
-                download_links = []
-                
-                for link in soup.find_all('a', href=True):
-                    text = link.get_text().strip().lower()
-                    href = link['href']
-                    
-                    if any(keyword in text for keyword in ['hd', 'download', 'mp4', 'without watermark']):
-                        if href.startswith('http'):
-                            download_links.append({
-                                'url': href,
-                                'text': link.get_text().strip(),
-                                'priority': 10 if 'hd' in text else 5
-                            })
-                
-                download_buttons = soup.find_all(['a', 'button'], class_=re.compile(r'download|btn-download', re.I))
-                for btn in download_buttons:
-                    href = btn.get('href') or btn.get('data-href')
-                    if href and href.startswith('http'):
-                        download_links.append({
-                            'url': href,
-                            'text': btn.get_text().strip(),
-                            'priority': 8
-                        })
-                
-                video_tags = soup.find_all('video')
-                for video in video_tags:
-                    source = video.get('src') or (video.find('source') and video.find('source').get('src'))
-                    if source and source.startswith('http'):
-                        download_links.append({
-                            'url': source,
-                            'text': 'Direct Video Link',
-                            'priority': 7
-                        })
-                
-                if download_links:
-                    download_links.sort(key=lambda x: x['priority'], reverse=True)
-                    print(f"[*] Found {len(download_links)} download options")
-                    for i, link in enumerate(download_links[:3], 1):
-                        print(f"    {i}. {link['text']} ({link['url'][:50]}...)")
-                    return download_links[0]['url']
-                else:
-                    print("[!] No download links found in the response")
-                    print("[*] Response HTML (first 500 chars):")
-                    print(str(response_data)[:500])
-                    return None
-                
-        except Exception as e:
-            print(f"[!] Error extracting download link: {str(e)}")
-            import traceback
-            traceback.print_exc()
-            return None
+                os.ftruncate(fd, total_size)
+            
+            with ThreadPoolExecutor(max_workers=len(ranges)) as pool:
+                futures = [
+                    pool.submit(
+                        self.call_with_retries,
+                        lambda segment=segment: self.fetch_range(download_url, fd, segment, advance),
+                        f"Segment {segment[0]}-{segment[1]}"
+                    )
+                    for segment in ranges
+                ]
+                results = [future.result() for future in futures]
+        finally:
+            os.close(fd)
+        
+        return all(results)
 
-    def download_video(self, download_url, output_filename="tiktok_video.mp4"):
+    def download_video(self, download_url, output_filename="tiktok_video.mp4", segments=None, progress=None):
+        part_filename = None
+        segments = segments or self.segments
+        if progress:
+            progress = ProgressThrottle(progress, self.progress_interval, self.progress_step)
         try:
             print(f"[*] Downloading video from: {download_url}")
+            part_filename = make_part_file(output_filename)
             
-            response = self.session.get(download_url, stream=True)
-            
-            if response.status_code == 200:
-                total_size = int(response.headers.get('content-length', 0))
-                
-                with open(output_filename, 'wb') as f:
-                    if total_size:
-                        downloaded = 0
-                        for chunk in response.iter_content(chunk_size=8192):
-                            if chunk:
-                                f.write(chunk)
-                                downloaded += len(chunk)
-                                progress = (downloaded / total_size) * 100
-                                print(f"\r[*] Download progress: {progress:.1f}%", end='', flush=True)
-                        print()
-                    else:
-                        for chunk in response.iter_content(chunk_size=8192):
-                            if chunk:
-                                f.write(chunk)
+            if segments > 1:
+                total_size = self.call_with_retries(lambda: self.probe_size(download_url), "Range probe")
+                if total_size and total_size >= 2 * MIN_SEGMENT_SIZE:
+                    segments = min(segments, total_size // MIN_SEGMENT_SIZE)
+                    start = time.monotonic()
+                    if not self.download_segmented(download_url, part_filename, total_size, segments, progress):
+                        os.remove(part_filename)
+                        return False
+                    metrics.record_download(total_size, time.monotonic() - start)
+                    if progress:
+                        progress.finish(total_size)
+                    
+                    os.replace(part_filename, output_filename)
+                    print(f"[+] Video downloaded successfully: {output_filename} ({total_size / 1024 / 1024:.2f} MB)")
+                    return True
                 
-                file_size = os.path.getsize(output_filename)
-                print(f"[+] Video downloaded successfully: {output_filename} ({file_size / 1024 / 1024:.2f} MB)")
-                return True
-            else:
-                print(f"[!] Failed to download video. Status code: {response.status_code}")
+                print("[*] Ranges not supported or file too small, using a single stream")
+            
+            with open(part_filename, 'wb') as f:
+                success = self.call_with_retries(lambda: self.fetch_into(download_url, f, progress), "Video download")
+            
+            if not success:
+                os.remove(part_filename)
                 return False
+            
+            os.replace(part_filename, output_filename)
+            file_size = os.path.getsize(output_filename)
+            if progress:
+                progress.finish(file_size)
+            print(f"[+] Video downloaded successfully: {output_filename} ({file_size / 1024 / 1024:.2f} MB)")
+            return True
                 
         except Exception as e:
             print(f"[!] Error downloading video: {str(e)}")
+            if part_filename and os.path.exists(part_filename):
+                os.remove(part_filename)
             return False
 
-    def download_tiktok_hd(self, tiktok_url, output_filename="tiktok_video.mp4"):
+    def download_tiktok_hd(self, tiktok_url, output_filename="tiktok_video.mp4", progress=None):
         print(f"\n{'='*60}")
         print("TikTok HD Video Downloader")
         print(f"{'='*60}\n")
@@ -212,14 +640,12 @@ class TikTokDownloader:
             print("[!] Failed to get download page")
             return False
         
-        time.sleep(1)
-        
         download_url = self.extract_hd_download_link(html_content)
         if not download_url:
             print("[!] Failed to extract download link")
             return False
         
-        success = self.download_video(download_url, output_filename)
+        success = self.download_video(download_url, output_filename, progress=progress)
         
         if success:
             print(f"\n[+] Download completed successfully!")
@@ -230,7 +656,351 @@ class TikTokDownloader:
         return success
 
 
+class AsyncTikTokDownloader:
+    def __init__(self, base_url=BASE_URL, max_connections=100, max_keepalive_connections=20,
+                 timeout=30.0, connect_timeout=10.0, rate_limiter=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                 spool_size=64 * 1024 * 1024, spool_dir=None, client=None, link_provider=None,
+                 max_retries=3, backoff_base=0.5, backoff_cap=30.0, progress_interval=0.5, progress_step=1.0,
+                 keepalive_expiry=5.0, http2=True, info_cache=None):
+        self.base_url = base_url
+        self.info_cache = info_cache or VideoInfoCache()
+        self.progress_interval = progress_interval
+        self.progress_step = progress_step
+        self.rate_limiter = rate_limiter or HostRateLimiter(DEFAULT_SCRAPE_RATE, DEFAULT_SCRAPE_BURST)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.chunk_size = chunk_size
+        self.spool_size = spool_size
+        self.spool_dir = spool_dir
+        self.link_provider = link_provider
+        self.owns_client = client is None
+        self.client = client or httpx.AsyncClient(
+            headers={**BROWSER_HEADERS, 'Accept-Encoding': 'gzip, deflate'},
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry
+            ),
+            timeout=httpx.Timeout(timeout, connect=connect_timeout),
+            follow_redirects=True,
+            http2=http2 and HTTP2_AVAILABLE
+        )
+
+    async def call_with_retries(self, func, description):
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await func()
+            except (RetryableError, httpx.TransportError) as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = backoff_delay(attempt, self.backoff_base, self.backoff_cap, getattr(e, 'retry_after', None))
+                print(f"[*] {description} failed ({str(e) or type(e).__name__}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    async def get_download_page(self, tiktok_url):
+        try:
+            print(f"[*] Submitting TikTok URL: {tiktok_url}")
+            
+            api_url = f"{self.base_url}/api/ajaxSearch"
+            
+            headers = {
+                'Content-Type': 'application/x-www-form-urlencoded; charset=UTF-8',
+                'Origin': self.base_url,
+                'Referer': f'{self.base_url}/en',
+                'X-Requested-With': 'XMLHttpRequest'
+            }
+            
+            payload = {
+                'q': tiktok_url,
+                'lang': 'en'
+            }
+            
+            print(f"[*] Sending POST request to API: {api_url}")
+            
+            async def post():
+                await self.rate_limiter.acquire_async(api_url)
+                with metrics.span('ajax_search', provider=self.base_url):
+                    response = await self.client.post(api_url, data=payload, headers=headers)
+                check_retryable_status(response)
+                return response
+            
+            response = await self.call_with_retries(post, "ajaxSearch request")
+            
+            if response.status_code == 200:
+                try:
+                    json_data = response.json()
+                    print("[*] Received JSON response")
+                    return json_data
+                except ValueError:
+                    print("[*] Received HTML response")
+                    return response.text
+            else:
+                print(f"[!] Error: Received status code {response.status_code}")
+                print(f"[*] Response: {response.text[:500]}")
+                return None
+                    
+        except Exception as e:
+            print(f"[!] Error getting download page: {str(e)}")
+            return None
+
+    async def extract_hd_download_link(self, response_data):
+        with metrics.span('parse'):
+            return await asyncio.to_thread(parse_hd_download_link, response_data)
+
+    async def extract_download_variants(self, response_data):
+        with metrics.span('parse'):
+            return await asyncio.to_thread(parse_download_variants, response_data)
+
+    async def probe_size(self, download_url):
+        headers = {'Accept-Encoding': 'identity'}
+        response = await self.client.head(download_url, headers=headers)
+        length = response.headers.get('Content-Length')
+        if response.status_code == 200 and length and length.isdigit():
+            return int(length)
+        
+        async with self.client.stream('GET', download_url, headers={**headers, 'Range': 'bytes=0-0'}) as response:
+            if response.status_code == 206:
+                return range_total(response.headers)
+        return None
+
+    async def probe_variant_sizes(self, variants):
+        sizes = await asyncio.gather(*(self.probe_size(variant['url']) for variant in variants), return_exceptions=True)
+        for variant, size in zip(variants, sizes):
+            variant['size'] = size if isinstance(size, int) else None
+
+    async def fetch_into(self, download_url, f, max_size=None, progress=None):
+        offset = f.tell()
+        headers = {'Accept-Encoding': 'identity'}
+        if offset:
+            headers['Range'] = f'bytes={offset}-'
+        
+        start = time.monotonic()
+        async with self.client.stream('GET', download_url, headers=headers) as response:
+            metrics.observe('cdn_ttfb', time.monotonic() - start)
+            if response.status_code == 416 and offset:
+                if range_total(response.headers) == offset:
+                    return True
+                f.seek(0)
+                f.truncate()
+                raise RetryableError("Partial download no longer matches the remote file")
+            
+            check_retryable_status(response)
+            
+            if response.status_code not in (200, 206):
+                print(f"[!] Failed to download video. Status code: {response.status_code}")
+                return False
+            
+            if response.status_code == 200 and offset:
+                f.seek(0)
+                f.truncate()
+                offset = 0
+            elif offset:
+                print(f"[*] Resuming download at {offset / 1024 / 1024:.2f} MB")
+            
+            total_size = expected_size(response.status_code, response.headers, offset)
+            if max_size and total_size and total_size > max_size:
+                raise FileTooLargeError(total_size, max_size)
+            
+            downloaded = offset
+            try:
+                async for chunk in response.aiter_bytes(chunk_size=self.chunk_size):
+                    downloaded += len(chunk)
+                    if max_size and downloaded > max_size:
+                        raise FileTooLargeError(downloaded, max_size)
+                    f.write(chunk)
+                    if progress:
+                        progress.update(downloaded, total_size)
+            finally:
+                metrics.record_download(downloaded - offset, time.monotonic() - start)
+            
+            if total_size and downloaded < total_size:
+                raise RetryableError(f"Connection closed after {downloaded} of {total_size} bytes")
+        
+        return True
+
+    async def download_video(self, download_url, output_filename="tiktok_video.mp4", max_size=None, progress=None):
+        part_filename = None
+        if progress:
+            progress = ProgressThrottle(progress, self.progress_interval, self.progress_step)
+        try:
+            print(f"[*] Downloading video from: {download_url}")
+            part_filename = make_part_file(output_filename)
+            
+            with open(part_filename, 'wb') as f:
+                success = await self.call_with_retries(
+                    lambda: self.fetch_into(download_url, f, max_size, progress), "Video download"
+                )
+            
+            if not success:
+                os.remove(part_filename)
+                return False
+            
+            os.replace(part_filename, output_filename)
+            file_size = os.path.getsize(output_filename)
+            if progress:
+                progress.finish(file_size)
+            print(f"[+] Video downloaded successfully: {output_filename} ({file_size / 1024 / 1024:.2f} MB)")
+            return True
+        
+        except FileTooLargeError:
+            os.remove(part_filename)
+            raise
+        except Exception as e:
+            print(f"[!] Error downloading video: {str(e)}")
+            if part_filename and os.path.exists(part_filename):
+                os.remove(part_filename)
+            return False
+        except BaseException:
+            if part_filename and os.path.exists(part_filename):
+                os.remove(part_filename)
+            raise
+
+    async def stream_video(self, download_url, max_size=None, progress=None):
+        print(f"[*] Streaming video from: {download_url}")
+        if progress:
+            progress = ProgressThrottle(progress, self.progress_interval, self.progress_step)
+        
+        buffer = tempfile.SpooledTemporaryFile(max_size=self.spool_size, dir=self.spool_dir)
+        try:
+            success = await self.call_with_retries(
+                lambda: self.fetch_into(download_url, buffer, max_size, progress), "Video stream"
+            )
+        except BaseException:
+            buffer.close()
+            raise
+        
+        if not success:
+            buffer.close()
+            return None
+        
+        size = buffer.tell()
+        buffer.seek(0)
+        if progress:
+            progress.finish(size)
+        print(f"[+] Video streamed successfully ({size / 1024 / 1024:.2f} MB)")
+        return buffer
+
+    async def resolve_variants(self, tiktok_url):
+        if self.link_provider is not None:
+            try:
+                return await self.link_provider.resolve_variants(tiktok_url)
+            except Exception as e:
+                print(f"[!] Failed to resolve download link: {str(e)}")
+                return []
+        
+        html_content = await self.get_download_page(tiktok_url)
+        if not html_content:
+            print("[!] Failed to get download page")
+            return []
+        
+        variants = await self.extract_download_variants(html_content)
+        if not variants:
+            print("[!] Failed to extract download link")
+        return variants
+
+    async def get_video_info(self, tiktok_url, probe_sizes=True):
+        key = video_info_key(tiktok_url)
+        info = self.info_cache.get(key)
+        if info is None:
+            variants = await self.resolve_variants(tiktok_url)
+            if not variants:
+                return None
+            info = make_video_info(tiktok_url, variants)
+            self.info_cache.set(key, info)
+        
+        if probe_sizes and not info.sized:
+            with metrics.span('probe'):
+                await self.probe_variant_sizes(info.videos())
+            info.sized = True
+        return info
+
+    async def fetch_best_variant(self, tiktok_url, max_size, fetch):
+        info = await self.get_video_info(tiktok_url, probe_sizes=False)
+        if info is None:
+            return None
+        
+        videos = info.videos()
+        if not videos:
+            print("[!] No video variant in the response")
+            return None
+        
+        # Fetch the best variant straight away; smaller ones are only tried once the CDN reports it is too large.
+        for variant in videos:
+            if max_size and variant.get('size') and variant['size'] > max_size:
+                continue
+            if variant is not videos[0]:
+                print(f"[*] Falling back to {variant['label']} variant to stay under the size limit")
+            try:
+                return await fetch(variant['url'])
+            except FileTooLargeError as e:
+                # Remembered on the cached VideoInfo, so retries skip straight to a variant that may fit.
+                variant['size'] = e.size
+        
+        raise FileTooLargeError(info.smallest_size(), max_size)
+
+    async def download_tiktok_hd(self, tiktok_url, output_filename="tiktok_video.mp4", max_size=None, progress=None):
+        success = await self.fetch_best_variant(
+            tiktok_url, max_size,
+            lambda download_url: self.download_video(download_url, output_filename, max_size=max_size, progress=progress)
+        )
+        
+        if success:
+            print(f"[+] Video saved as: {output_filename}")
+        else:
+            # The CDN link may have expired; resolve it again next time.
+            self.info_cache.delete(video_info_key(tiktok_url))
+            print(f"[!] Download failed: {tiktok_url}")
+        
+        return bool(success)
+
+    async def stream_tiktok_hd(self, tiktok_url, max_size=None, progress=None):
+        async def stream(download_url):
+            try:
+                return await self.stream_video(download_url, max_size=max_size, progress=progress)
+            except FileTooLargeError:
+                raise
+            except Exception as e:
+                print(f"[!] Error streaming video: {str(e)}")
+                return None
+        
+        buffer = await self.fetch_best_variant(tiktok_url, max_size, stream)
+        if buffer is None:
+            self.info_cache.delete(video_info_key(tiktok_url))
+        return buffer
+
+    async def aclose(self):
+        if self.owns_client:
+            await self.client.aclose()
+
+
 def main():
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Download TikTok videos in HD without watermark")
+    parser.add_argument('--input', help="text file with one TikTok URL per line (batch mode)")
+    parser.add_argument('--jobs', type=int, default=4, help="concurrent downloads in batch mode")
+    parser.add_argument('--out', default='downloads', help="output directory in batch mode")
+    parser.add_argument('--manifest', help="checkpoint file of completed videos (default: <out>/manifest.jsonl)")
+    parser.add_argument('--results', default='-', help="JSONL file for per-URL results (default: stdout)")
+    parser.add_argument('--segments', type=int, default=1, help="parallel range requests per video")
+    parser.add_argument('--scrape-jobs', type=int, help="concurrent ajaxSearch requests in batch mode (default: --jobs)")
+    parser.add_argument('--parse-jobs', type=int, default=2, help="HTML parsing workers in batch mode")
+    parser.add_argument('--rate', type=float, default=DEFAULT_SCRAPE_RATE,
+                        help="ajaxSearch requests per second per host in batch mode (0 = unlimited)")
+    parser.add_argument('--stats-interval', type=float, default=10.0,
+                        help="seconds between per-stage queue depth and throughput reports in batch mode (0 = off)")
+    args = parser.parse_args()
+    
+    if args.input:
+        from batch import run_batch
+        run_batch(
+            args.input, args.out, args.jobs, args.manifest, args.results, args.segments,
+            scrape_jobs=args.scrape_jobs, parse_jobs=args.parse_jobs, rate=args.rate,
+            stats_interval=args.stats_interval
+        )
+        return
+    
     tiktok_url = input("Enter TikTok video URL: ").strip()
     
     if not tiktok_url:
@@ -244,8 +1014,8 @@ def main():
     if not output_filename.endswith('.mp4'):
         output_filename += '.mp4'
     
-    downloader = TikTokDownloader()
-    downloader.download_tiktok_hd(tiktok_url, output_filename)
+    downloader = TikTokDownloader(segments=args.segments)
+    downloader.download_tiktok_hd(tiktok_url, output_filename, progress=print_progress)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+
+import os
+import sqlite3
+import threading
+import time
+
+import metrics
+
+
+class FileIdCache:
+    def __init__(self, path="cache/file_ids.db", ttl=7 * 24 * 3600, max_entries=10000):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS file_ids ('
+            'key TEXT PRIMARY KEY, '
+            'file_id TEXT NOT NULL, '
+            'file_size INTEGER, '
+            'created_at REAL NOT NULL, '
+            'last_access REAL NOT NULL)'
+        )
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_file_ids_last_access ON file_ids (last_access)')
+        self.conn.commit()
+
+    def get(self, key):
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute(
+                'SELECT file_id, file_size, created_at FROM file_ids WHERE key = ?', (key,)
+            ).fetchone()
+            
+            if row is None or (self.ttl and now - row[2] > self.ttl):
+                if row is not None:
+                    self.conn.execute('DELETE FROM file_ids WHERE key = ?', (key,))
+                    self.conn.commit()
+                self.misses += 1
+                metrics.record_cache('file_id', False)
+                return None
+            
+            self.conn.execute('UPDATE file_ids SET last_access = ? WHERE key = ?', (now, key))
+            self.conn.commit()
+            self.hits += 1
+            metrics.record_cache('file_id', True)
+            return {'file_id': row[0], 'file_size': row[1]}
+
+    def set(self, key, file_id, file_size=None):
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO file_ids (key, file_id, file_size, created_at, last_access) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (key, file_id, file_size, now, now)
+            )
+            self._evict(now)
+            self.conn.commit()
+
+    def delete(self, key):
+        with self.lock:
+            self.conn.execute('DELETE FROM file_ids WHERE key = ?', (key,))
+            self.conn.commit()
+
+    def _evict(self, now):
+        if self.ttl:
+            self.conn.execute('DELETE FROM file_ids WHERE created_at < ?', (now - self.ttl,))
+        
+        if self.max_entries:
+            self.conn.execute(
+                'DELETE FROM file_ids WHERE key IN ('
+                'SELECT key FROM file_ids ORDER BY last_access DESC LIMIT -1 OFFSET ?)',
+                (self.max_entries,)
+            )
+
+    def stats(self):
+        with self.lock:
+            entries = self.conn.execute('SELECT COUNT(*) FROM file_ids').fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': entries,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+
+import threading
+import time
+from collections import OrderedDict
+
+HD = 'hd'
+NO_WATERMARK = 'no_watermark'
+VIDEO = 'video'
+AUDIO = 'audio'
+IMAGE = 'image'
+
+VIDEO_LABELS = (HD, NO_WATERMARK, VIDEO)
+
+
+def classify_link(text):
+    lowered = text.lower()
+    if 'mp3' in lowered or 'audio' in lowered:
+        return AUDIO
+    if 'image' in lowered or 'photo' in lowered:
+        return IMAGE
+    if 'hd' in lowered:
+        return HD
+    if 'watermark' in lowered or 'mp4' in lowered:
+        # ajaxSearch backends only offer watermark-free MP4s.
+        return NO_WATERMARK
+    return VIDEO
+
+
+class VideoInfo:
+    def __init__(self, url, video_id=None, creator=None, variants=None):
+        self.url = url
+        self.video_id = video_id
+        self.creator = creator
+        self.variants = variants or []
+        self.sized = False
+        self.created_at = time.monotonic()
+
+    def videos(self):
+        return [variant for variant in self.variants if variant['label'] in VIDEO_LABELS]
+
+    def audio(self):
+        return next((variant for variant in self.variants if variant['label'] == AUDIO), None)
+
+    def best_variant(self, max_size=None):
+        # Variants are ordered best first; take the first that fits or whose size is unknown.
+        for variant in self.videos():
+            if not max_size or variant.get('size') is None or variant['size'] <= max_size:
+                return variant
+        return None
+
+    def smallest_size(self):
+        sizes = [variant['size'] for variant in self.videos() if variant.get('size')]
+        return min(sizes) if sizes else None
+
+    def to_dict(self):
+        return {
+            'url': self.url,
+            'video_id': self.video_id,
+            'creator': self.creator,
+            'variants': [dict(variant) for variant in self.variants]
+        }
+
+
+class VideoInfoCache:
+    def __init__(self, ttl=300, max_entries=1000):
+        # CDN links are signed and expire, so entries only live for a few minutes.
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            info = self.entries.get(key)
+            if info is None or time.monotonic() - info.created_at > self.ttl:
+                if info is not None:
+                    del self.entries[key]
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return info
+
+    def set(self, key, info):
+        with self.lock:
+            self.entries[key] = info
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': len(self.entries),
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
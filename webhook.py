@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+
+import asyncio
+import hmac
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import secrets
+import sqlite3
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from telegram import Bot, Update
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+MAX_UPDATE_SIZE = 1024 * 1024
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+
+class ProcessQueue:
+    def __init__(self, maxsize=1000):
+        self.queue = multiprocessing.Queue(maxsize)
+
+    def put(self, payload):
+        try:
+            self.queue.put_nowait(payload)
+            return True
+        except queue.Full:
+            return False
+
+    def get(self, timeout=1.0):
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class RedisQueue:
+    def __init__(self, url, key='tiktok:updates'):
+        if redis is None:
+            raise RuntimeError("UPDATE_QUEUE_URL points at Redis but the redis package is not installed")
+        self.url = url
+        self.key = key
+        self.client = None
+        self.pid = None
+
+    def connection(self):
+        # Connections must not be shared across fork, so each process opens its own.
+        if self.client is None or self.pid != os.getpid():
+            self.client = redis.Redis.from_url(self.url)
+            self.pid = os.getpid()
+        return self.client
+
+    def put(self, payload):
+        self.connection().lpush(self.key, payload)
+        return True
+
+    def get(self, timeout=1.0):
+        item = self.connection().brpop(self.key, timeout=max(1, int(timeout)))
+        return item[1] if item else None
+
+
+class SqliteIdempotency:
+    def __init__(self, path="cache/updates.db", ttl=24 * 3600):
+        self.ttl = ttl
+        self.claims = 0
+        self.lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS updates ('
+            'update_id INTEGER PRIMARY KEY, '
+            'created_at REAL NOT NULL)'
+        )
+        self.conn.commit()
+
+    def claim(self, update_id):
+        now = time.time()
+        with self.lock:
+            cursor = self.conn.execute(
+                'INSERT OR IGNORE INTO updates (update_id, created_at) VALUES (?, ?)', (update_id, now)
+            )
+            self.claims += 1
+            if self.claims % 1000 == 0:
+                self.conn.execute('DELETE FROM updates WHERE created_at < ?', (now - self.ttl,))
+            self.conn.commit()
+            return cursor.rowcount == 1
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+class RedisIdempotency:
+    def __init__(self, url, ttl=24 * 3600, prefix='tiktok:update:'):
+        if redis is None:
+            raise RuntimeError("UPDATE_QUEUE_URL points at Redis but the redis package is not installed")
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def claim(self, update_id):
+        return bool(self.client.set(f"{self.prefix}{update_id}", 1, nx=True, ex=self.ttl))
+
+    def close(self):
+        self.client.close()
+
+
+def is_redis_url(url):
+    return bool(url) and urlsplit(url).scheme in ('redis', 'rediss', 'unix')
+
+
+def make_queue(url, maxsize=1000):
+    if is_redis_url(url):
+        return RedisQueue(url)
+    return ProcessQueue(maxsize)
+
+
+def make_idempotency(url, path):
+    if is_redis_url(url):
+        return RedisIdempotency(url)
+    return SqliteIdempotency(path)
+
+
+class WebhookHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == '/healthz':
+            self.reply(200, b'ok')
+        else:
+            self.reply(404)
+
+    def do_POST(self):
+        server = self.server
+        if urlsplit(self.path).path != server.webhook_path:
+            self.reply(404)
+            return
+
+        token = self.headers.get(SECRET_HEADER, '')
+        if server.secret and not hmac.compare_digest(token, server.secret):
+            logger.warning(f"Rejected webhook call from {self.client_address[0]}: bad secret token")
+            self.reply(403)
+            return
+
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+        except ValueError:
+            self.reply(400)
+            return
+        if length <= 0 or length > MAX_UPDATE_SIZE:
+            self.reply(413 if length > MAX_UPDATE_SIZE else 400)
+            return
+
+        payload = self.rfile.read(length)
+        # A non-2xx answer makes Telegram redeliver the update later, which is the backpressure we want.
+        self.reply(200 if server.updates.put(payload) else 503)
+
+    def reply(self, status, body=b''):
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class WebhookServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+    def __init__(self, address, updates, webhook_path='/webhook', secret=None):
+        super().__init__(address, WebhookHandler)
+        self.updates = updates
+        self.webhook_path = webhook_path
+        self.secret = secret
+
+
+async def dispatch_update(application, payload, dedup):
+    try:
+        data = json.loads(payload)
+    except ValueError:
+        logger.warning("Dropped malformed update payload")
+        return
+
+    update_id = data.get('update_id')
+    # Claim before processing: a redelivered or duplicated update is handled by exactly one worker.
+    if update_id is not None and not await asyncio.to_thread(dedup.claim, update_id):
+        logger.info(f"Skipping update {update_id}, already handled")
+        return
+
+    await application.update_queue.put(Update.de_json(data, application.bot))
+
+
+async def consume_updates(bot, updates, dedup, stop):
+    application = bot.build_application()
+    async with application:
+        await application.start()
+        try:
+            while not stop.is_set():
+                try:
+                    payload = await asyncio.to_thread(updates.get, 1.0)
+                    if payload is not None:
+                        await dispatch_update(application, payload, dedup)
+                except Exception as e:
+                    logger.error(f"Error dispatching update: {e}", exc_info=True)
+                    await asyncio.sleep(1)
+        finally:
+            await application.stop()
+            await bot.shutdown(application)
+
+
+def run_worker(token, updates, queue_url, dedup_path, stop, index):
+    from telegram_bot import TikTokBot
+
+    bot = TikTokBot(token)
+    # SingleFlight only coalesces within a process, so workers must not share scratch files.
+    bot.work_dir = os.path.join(bot.download_dir, f"worker-{os.getpid()}")
+    os.makedirs(bot.work_dir, exist_ok=True)
+    if bot.metrics_port:
+        bot.start_metrics(bot.metrics_port + index + 1)
+    dedup = make_idempotency(queue_url, dedup_path)
+    logger.info(f"Webhook worker {index} started (pid {os.getpid()})")
+    try:
+        asyncio.run(consume_updates(bot, updates, dedup, stop))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        dedup.close()
+        try:
+            os.rmdir(bot.work_dir)
+        except OSError:
+            pass
+
+
+async def register_webhook(token, url, secret):
+    async with Bot(token, base_url=os.getenv('TELEGRAM_API_URL') or 'https://api.telegram.org/bot') as bot:
+        await bot.set_webhook(url, secret_token=secret, allowed_updates=Update.ALL_TYPES)
+    logger.info(f"Webhook registered at {url}")
+
+
+def run_webhook(token):
+    role = os.getenv('WEBHOOK_ROLE', 'all')
+    url = os.getenv('WEBHOOK_URL')
+    queue_url = os.getenv('UPDATE_QUEUE_URL')
+    dedup_path = os.getenv('UPDATE_DEDUP_PATH', 'cache/updates.db')
+    secret = os.getenv('WEBHOOK_SECRET')
+    workers = int(os.getenv('WEBHOOK_WORKERS', str(os.cpu_count() or 1)))
+
+    if role not in ('all', 'receiver', 'worker'):
+        raise ValueError(f"Unknown WEBHOOK_ROLE: {role}")
+    if role != 'all' and not is_redis_url(queue_url):
+        raise ValueError("Separate receiver and worker roles need a shared UPDATE_QUEUE_URL (redis://...)")
+    if role != 'worker' and not url:
+        raise ValueError("WEBHOOK_URL is required to receive updates")
+    if role == 'receiver' and not secret:
+        raise ValueError("WEBHOOK_SECRET is required when the receiver runs separately from the workers")
+    if role == 'all' and not secret:
+        secret = secrets.token_urlsafe(32)
+
+    updates = make_queue(queue_url, int(os.getenv('UPDATE_QUEUE_SIZE', '1000')))
+    stop = multiprocessing.Event()
+    processes = []
+    server = None
+
+    try:
+        if role != 'receiver':
+            for index in range(workers):
+                process = multiprocessing.Process(
+                    target=run_worker, args=(token, updates, queue_url, dedup_path, stop, index),
+                    name=f"webhook-worker-{index}"
+                )
+                process.start()
+                processes.append(process)
+
+        if role == 'worker':
+            print(f"Running {workers} webhook workers! Press Ctrl+C to stop.")
+            for process in processes:
+                process.join()
+            return
+
+        listen = os.getenv('WEBHOOK_LISTEN', '0.0.0.0')
+        port = int(os.getenv('WEBHOOK_PORT', '8443'))
+        server = WebhookServer((listen, port), updates, urlsplit(url).path or '/', secret)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        asyncio.run(register_webhook(token, url, secret))
+
+        print(f"Bot is receiving webhooks on {listen}:{port} with {len(processes)} workers! Press Ctrl+C to stop.")
+        while True:
+            time.sleep(1)
+            for process in processes:
+                if not process.is_alive():
+                    raise RuntimeError(f"{process.name} exited with code {process.exitcode}")
+    finally:
+        if server:
+            server.shutdown()
+        stop.set()
+        for process in processes:
+            process.join(timeout=30)
+            if process.is_alive():
+                process.terminate()